@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers de selectores instalados una vez por contexto.
+
+add_init_script define window.__mlSel en cada documento nuevo, así las
+herramientas invocan funciones que v8 ya tiene compiladas con un evaluate
+mínimo, en lugar de reenviar el código fuente completo por CDP en cada
+llamada.
+"""
+
+SELECTOR_HELPERS_JS = """
+window.__mlSel = {
+    analyze: (opts) => {
+        const { sel, n, extractText, checkVisibility } = opts;
+        const all = document.querySelectorAll(sel);
+        if (all.length === 0 || all.length > 100) {
+            // Respuesta estructural: con 0 matches no hay nada que mirar y
+            // con >100 el selector es demasiado amplio para que la muestra
+            // aporte; se evita recorrer innerText/layout de esos elementos
+            return { total: all.length, types: {}, items: [] };
+        }
+        const sample = Array.from(all).slice(0, n);
+        const types = {};
+        for (const el of sample) {
+            const tag = el.tagName.toLowerCase();
+            types[tag] = (types[tag] || 0) + 1;
+        }
+        return {
+            total: all.length,
+            types: types,
+            items: sample.map(el => {
+                // innerText fuerza style+layout por elemento; si no se pidió
+                // visibilidad alcanza con textContent, que solo lee el DOM
+                const t = ((checkVisibility ? el.innerText : el.textContent) || '').trim();
+                return {
+                    visible: checkVisibility
+                        ? !!(el.offsetParent || el.getClientRects().length)
+                        : null,
+                    text: extractText ? t.slice(0, 100) : null,
+                    length: t.length
+                };
+            })
+        };
+    },
+    analyzeMany: (opts) => {
+        // Analizar el lote en una sola llamada amortiza layout y estilos
+        // ya calculados entre todos los selectores, además de colapsar N
+        // round-trips CDP en uno
+        return opts.sels.map(sel => window.__mlSel.analyze({
+            sel: sel,
+            n: opts.n,
+            extractText: opts.extractText,
+            checkVisibility: opts.checkVisibility
+        }));
+    },
+    discover: (candidates) => {
+        const out = [];
+        const push = (sel, conf, desc, n) => {
+            if (n) {
+                out.push({
+                    selector: sel,
+                    confidence: conf,
+                    description: desc,
+                    element_count: n
+                });
+            }
+        };
+        if (candidates.length) {
+            // Un solo querySelectorAll con la unión recorre el DOM una vez;
+            // cada match se reasigna a su selector de origen con el.matches
+            // (O(1) contra un selector diminuto)
+            let all = null;
+            try {
+                all = document.querySelectorAll(candidates.map(c => c[0]).join(', '));
+            } catch (err) {}
+            if (all === null) {
+                // Respaldo por selector si la unión no es CSS válido
+                for (const [sel, conf, desc] of candidates) {
+                    let n = 0;
+                    try { n = document.querySelectorAll(sel).length; } catch (err) {}
+                    push(sel, conf, desc, n);
+                }
+            } else {
+                const counts = new Map();
+                for (const el of all) {
+                    for (const [sel] of candidates) {
+                        if (el.matches(sel)) {
+                            counts.set(sel, (counts.get(sel) || 0) + 1);
+                        }
+                    }
+                }
+                for (const [sel, conf, desc] of candidates) {
+                    push(sel, conf, desc, counts.get(sel) || 0);
+                }
+            }
+        }
+        return {
+            discovered: out,
+            pageInfo: {
+                url: location.href,
+                title: document.title
+            }
+        };
+    }
+};
+"""
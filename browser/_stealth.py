@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Script anti-detección inyectado en cada contexto del navegador
+"""
+
+# Constante a nivel de módulo: se interna una sola vez y se registra por
+# contexto (no por página), de modo que las páginas paralelas lo heredan
+STEALTH_JS: str = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+
+    delete navigator.__proto__.webdriver;
+
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['es-MX', 'es', 'en-US', 'en'],
+    });
+
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+
+    Object.defineProperty(navigator, 'platform', {
+        get: () => 'Win32',
+    });
+
+    window.chrome = {
+        runtime: {},
+        // etc.
+    };
+
+    Object.defineProperty(navigator, 'permissions', {
+        get: () => ({
+            query: async () => ({ state: 'granted' }),
+        }),
+    });
+"""
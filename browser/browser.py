@@ -1,20 +1,146 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import atexit
 import logging
 import random
+import re
 from datetime import datetime
+from functools import lru_cache
 from typing import  Optional
-from urllib.parse import urlparse
+from urllib.parse import urlsplit
 from playwright.async_api import async_playwright, Browser, Page, BrowserContext, TimeoutError as PlaywrightTimeoutError
 
 from models.product import PageInfo
-from .config import BrowserConfig
+from .config import BrowserConfig, next_user_agent
+from ._stealth import STEALTH_JS
+from ._page_helpers import SELECTOR_HELPERS_JS
 
 
 logger = logging.getLogger(__name__)
 
 
+class _BrowserPool:
+    """Pool de navegadores Chromium pre-calentados para amortizar el costo de lanzamiento"""
+
+    def __init__(self, max_size: int = 2):
+        self.max_size = max_size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._size = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, playwright, config: BrowserConfig) -> Browser:
+        """Obtiene un navegador del pool o lanza uno nuevo si hay capacidad"""
+        # Reusar navegador inactivo si existe y sigue conectado
+        while not self._idle.empty():
+            browser = self._idle.get_nowait()
+            if browser.is_connected():
+                return browser
+            self._size -= 1
+
+        async with self._lock:
+            if self._size < self.max_size:
+                browser = await playwright.chromium.launch(
+                    headless=config.HEADLESS,
+                    args=config.BROWSER_ARGS,
+                    slow_mo=50  # Simular comportamiento humano
+                )
+                self._size += 1
+                return browser
+
+        # Pool lleno: esperar a que se libere uno
+        return await self._idle.get()
+
+    async def release(self, browser: Browser):
+        """Devuelve un navegador al pool sin cerrarlo"""
+        if browser and browser.is_connected():
+            self._idle.put_nowait(browser)
+        else:
+            self._size -= 1
+
+    async def shutdown(self):
+        """Cierra realmente todos los navegadores del pool"""
+        while not self._idle.empty():
+            browser = self._idle.get_nowait()
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning("⚠️ Error cerrando navegador del pool: %s", e)
+            self._size -= 1
+
+
+_pool = _BrowserPool()
+
+# Driver de Playwright compartido para que los navegadores del pool sobrevivan
+# al cierre de instancias individuales de MercadoLibreBrowser
+_playwright = None
+
+
+async def _get_playwright():
+    global _playwright
+    if _playwright is None:
+        _playwright = await async_playwright().__aenter__()
+    return _playwright
+
+
+def _shutdown_pool():
+    """Drena el pool al salir del proceso"""
+    global _playwright
+    try:
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(_pool.shutdown())
+        if _playwright is not None:
+            loop.run_until_complete(_playwright.__aexit__(None, None, None))
+            _playwright = None
+        loop.close()
+    except Exception:
+        pass
+
+
+atexit.register(_shutdown_pool)
+
+
+@lru_cache(maxsize=1024)
+def _is_valid_ml_url_cached(url: str, valid_domains: tuple, valid_prefixes: tuple) -> bool:
+    """Valida el dominio de una URL, cacheado por URL repetida"""
+    # Camino rápido: un startswith en C sobre los prefijos precomputados
+    if url.startswith(valid_prefixes):
+        return True
+    # Fallback estricto para URLs sin path (p.ej. la homepage sin '/');
+    # hostname (y no netloc) ignora puerto/credenciales y normaliza mayúsculas
+    try:
+        return urlsplit(url).hostname in valid_domains
+    except Exception:
+        return False
+
+
+# Patrones precompilados para clasificar títulos/URLs en un solo escaneo
+_ERR_RE = re.compile(r'error|not found|404|503|500|blocked|denied|forbidden', re.I)
+_SEARCH_RE = re.compile(r'/search|listado\.mercadolibre|q=')
+_PRODUCT_RE = re.compile(r'/p/|MLA|articulo\.mercadolibre')
+
+
+# Tipos de recurso que el scraper nunca lee: bloquearlos ahorra la mayor
+# parte de los bytes y del tiempo de carga en páginas de resultados de ML
+_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+# Hosts de analytics/tracking que solo agregan latencia y bytes
+_BLOCK_HOSTS = ('google-analytics', 'doubleclick', 'hotjar')
+
+
+async def _block_heavy(route):
+    """Handler de rutas que aborta recursos pesados innecesarios"""
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    elif any(host in request.url for host in _BLOCK_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+
+
 class MercadoLibreBrowser:
    
     
@@ -26,6 +152,8 @@ class MercadoLibreBrowser:
         self.current_url = ""
         self.playwright = None
         self.retry_count = 0
+        # Vectores de jitter pre-muestreados por tipo de delay humano
+        self._jitter_pools: dict = {}
         
     async def initialize(self, retry: bool = True):
         """Inicializar navegador con configuración mejorada"""
@@ -33,88 +161,103 @@ class MercadoLibreBrowser:
             return True
             
         try:
-            self.playwright = await async_playwright().__aenter__()
-            
-            # Lanzar navegador con configuración anti-detección
-            self.browser = await self.playwright.chromium.launch(
-                headless=self.config.HEADLESS,
-                args=self.config.BROWSER_ARGS,
-                slow_mo=50  # Simular comportamiento humano
-            )
-            
-            # Crear contexto con configuración completa
-            context_options = {
-                'viewport': self.config.VIEWPORT,
-                'user_agent': random.choice(self.config.USER_AGENTS),
-                'locale': self.config.LOCALE,
-                'timezone_id': self.config.TIMEZONE,
-                'extra_http_headers': self.config.EXTRA_HEADERS,
-                'java_script_enabled': True,
-                'accept_downloads': False,
-                'ignore_https_errors': True,
-            }
-            
-            # Agregar proxy si está configurado
-            if self.config.PROXY_CONFIG['enabled'] and self.config.PROXY_CONFIG['server']:
-                context_options['proxy'] = {
-                    'server': self.config.PROXY_CONFIG['server'],
-                    'username': self.config.PROXY_CONFIG.get('username'),
-                    'password': self.config.PROXY_CONFIG.get('password'),
-                }
-            
-            self.context = await self.browser.new_context(**context_options)
-            
-            # Configurar página con scripts anti-detección
-            self.page = await self.context.new_page()
-            
-            # Eliminar propiedades de automatización
-            await self.page.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                delete navigator.__proto__.webdriver;
-                
-                Object.defineProperty(navigator, 'languages', {
-                    get: () => ['es-MX', 'es', 'en-US', 'en'],
-                });
-                
-                Object.defineProperty(navigator, 'plugins', {
-                    get: () => [1, 2, 3, 4, 5],
-                });
-                
-                Object.defineProperty(navigator, 'platform', {
-                    get: () => 'Win32',
-                });
-                
-                window.chrome = {
-                    runtime: {},
-                    // etc.
-                };
-                
-                Object.defineProperty(navigator, 'permissions', {
-                    get: () => ({
-                        query: async () => ({ state: 'granted' }),
-                    }),
-                });
-            """)
-            
-            # Configurar timeouts
-            self.page.set_default_timeout(self.config.TIMEOUT)
-            self.page.set_default_navigation_timeout(self.config.TIMEOUT)
-            
+            self.playwright = await _get_playwright()
+
+            # Obtener navegador del pool (se lanza solo si no hay pre-calentados)
+            self.browser = await _pool.acquire(self.playwright, self.config)
+
             logger.info("✅ Navegador inicializado correctamente")
             return True
             
         except Exception as e:
-            logger.error(f"❌ Error inicializando navegador: {e}")
+            logger.error("❌ Error inicializando navegador: %s", e)
             if retry and self.retry_count < self.config.MAX_RETRIES:
                 self.retry_count += 1
-                logger.info(f"🔄 Reintentando inicialización ({self.retry_count}/{self.config.MAX_RETRIES})")
+                logger.info("🔄 Reintentando inicialización (%s/%s)", self.retry_count, self.config.MAX_RETRIES)
                 await asyncio.sleep(self.config.RETRY_DELAY)
                 return await self.initialize(retry=False)
             return False
-    
+
+    def _jitter(self, kind: str) -> float:
+        """
+        Devuelve un delay aleatorio pre-muestreado para HUMAN_DELAYS[kind].
+
+        Muestrear en lotes de 256 evita llamar a random.uniform en los hot
+        paths, donde bajo concurrencia el costo Python se vuelve medible.
+        """
+        pool = self._jitter_pools.get(kind)
+        if not pool:
+            lo, hi = self.config.HUMAN_DELAYS[kind]
+            pool = [random.uniform(lo, hi) for _ in range(256)]
+            self._jitter_pools[kind] = pool
+        return pool.pop()
+
+    def _context_options(self) -> dict:
+        """Construye las opciones del contexto con configuración anti-detección"""
+        context_options = {
+            'viewport': self.config.VIEWPORT,
+            'user_agent': next_user_agent(),
+            'locale': self.config.LOCALE,
+            'timezone_id': self.config.TIMEZONE,
+            # dict() porque el serializador de Playwright espera un dict real,
+            # no la vista de sólo lectura
+            'extra_http_headers': dict(self.config.EXTRA_HEADERS),
+            'java_script_enabled': True,
+            'accept_downloads': False,
+            'ignore_https_errors': True,
+        }
+
+        # Agregar proxy si está configurado
+        if self.config.PROXY_CONFIG['enabled'] and self.config.PROXY_CONFIG['server']:
+            context_options['proxy'] = {
+                'server': self.config.PROXY_CONFIG['server'],
+                'username': self.config.PROXY_CONFIG.get('username'),
+                'password': self.config.PROXY_CONFIG.get('password'),
+            }
+
+        return context_options
+
+    async def _new_session(self):
+        """
+        Abre un contexto + página frescos para una sesión de scraping.
+
+        Los contextos largos acumulan datos de logging/tracing en Playwright,
+        así que se descarta el contexto anterior en cada navegación.
+        """
+        # Descartar sesión anterior para liberar la memoria del contexto
+        if self.page:
+            try:
+                await self.page.close()
+            except Exception:
+                pass
+            self.page = None
+        if self.context:
+            try:
+                await self.context.close()
+            except Exception:
+                pass
+            self.context = None
+
+        self.context = await self.browser.new_context(**self._context_options())
+
+        # Eliminar propiedades de automatización en todas las páginas del contexto
+        await self.context.add_init_script(STEALTH_JS)
+
+        # Instalar los helpers de selectores una sola vez por documento
+        await self.context.add_init_script(SELECTOR_HELPERS_JS)
+
+        # Bloquear imágenes/CSS/fuentes/media para reducir ancho de banda
+        if self.config.BLOCK_SUBRESOURCES:
+            await self.context.route("**/*", _block_heavy)
+
+        self.page = await self.context.new_page()
+
+        # Configurar timeouts
+        self.page.set_default_timeout(self.config.TIMEOUT)
+        self.page.set_default_navigation_timeout(self.config.TIMEOUT)
+
+        return self.page
+
     async def close(self):
         """Cerrar navegador limpiamente"""
         try:
@@ -123,10 +266,9 @@ class MercadoLibreBrowser:
             if self.context:
                 await self.context.close()
             if self.browser:
-                await self.browser.close()
-            if self.playwright:
-                await self.playwright.__aexit__(None, None, None)
-                
+                # Devolver al pool en lugar de cerrar (se cierra en el shutdown del pool)
+                await _pool.release(self.browser)
+
             self.browser = None
             self.context = None
             self.page = None
@@ -134,7 +276,7 @@ class MercadoLibreBrowser:
             
             logger.info("✅ Navegador cerrado correctamente")
         except Exception as e:
-            logger.error(f"⚠️ Error cerrando navegador: {e}")
+            logger.error("⚠️ Error cerrando navegador: %s", e)
     
     async def navigate(self, url: str, retry: bool = True) -> bool:
         """Navegar a URL específica con retry logic mejorado"""
@@ -146,28 +288,31 @@ class MercadoLibreBrowser:
             # Validar URL
             if not self.is_valid_ml_url(url):
                 raise ValueError(f"URL no es de MercadoLibre México: {url}")
-            
-            logger.info(f"🌐 Navegando a: {url}")
+
+            # Contexto fresco por navegación para evitar acumulación de memoria
+            await self._new_session()
+
+            logger.info("🌐 Navegando a: %s", url)
             
             # Intentar navegación con diferentes estrategias
-            success = await self._attempt_navigation(url)
-            
-            if success:
-                # Esperar carga completa
-                await self._wait_for_stable_load()
+            strategy = await self._attempt_navigation(url)
+
+            if strategy:
+                # El readiness ya se verificó fuera de banda; no esperar networkidle
+                await self._wait_for_stable_load(skip_networkidle=True)
                 self.current_url = self.page.url
                 self.retry_count = 0  # Reset retry count on success
-                logger.info(f"✅ Navegación exitosa: {self.current_url}")
+                logger.info("✅ Navegación exitosa: %s", self.current_url)
                 return True
             else:
                 raise Exception("No se pudo completar la navegación")
                 
         except Exception as e:
-            logger.error(f"❌ Error navegando a {url}: {e}")
+            logger.error("❌ Error navegando a %s: %s", url, e)
             
             if retry and self.retry_count < self.config.MAX_RETRIES:
                 self.retry_count += 1
-                logger.info(f"🔄 Reintentando navegación ({self.retry_count}/{self.config.MAX_RETRIES})")
+                logger.info("🔄 Reintentando navegación (%s/%s)", self.retry_count, self.config.MAX_RETRIES)
                 
                 # Estrategias de recuperación
                 await self._recovery_strategy()
@@ -177,40 +322,115 @@ class MercadoLibreBrowser:
             
             return False
     
-    async def _attempt_navigation(self, url: str) -> bool:
-        """Intenta navegar con diferentes estrategias"""
-        strategies = [
-            ('networkidle', self.config.TIMEOUT),
-            ('domcontentloaded', self.config.TIMEOUT // 2),
-            ('load', self.config.TIMEOUT // 3),
-            (None, 15000)  # Sin wait_until, timeout corto
-        ]
-        
-        for wait_until, timeout in strategies:
+    async def navigate_many(self, urls, concurrency: int = 8) -> list:
+        """
+        Navega varias URLs en paralelo sobre el navegador compartido.
+
+        Cada worker abre su propio contexto + página (cerrados en finally),
+        limitado por un semáforo para no saturar la red ni disparar la
+        detección de bots de ML.
+
+        Args:
+            urls: Lista de URLs de MercadoLibre México
+            concurrency: Máximo de páginas simultáneas
+
+        Returns:
+            Lista de PageInfo en el mismo orden que las URLs
+        """
+        if not await self.initialize():
+            return [
+                PageInfo(url=u, title="", is_ml_mexico=False,
+                         timestamp=datetime.now().isoformat())
+                for u in urls
+            ]
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def worker(url: str) -> PageInfo:
+            async with sem:
+                context = None
+                page = None
+                try:
+                    context = await self.browser.new_context(**self._context_options())
+                    await context.add_init_script(STEALTH_JS)
+                    await context.add_init_script(SELECTOR_HELPERS_JS)
+                    if self.config.BLOCK_SUBRESOURCES:
+                        await context.route("**/*", _block_heavy)
+                    page = await context.new_page()
+                    page.set_default_navigation_timeout(self.config.TIMEOUT)
+
+                    # wait_until='commit' devuelve el control apenas llega la
+                    # respuesta, solapando el parseo de esta página con el
+                    # arranque de la siguiente; la readiness se espera aparte
+                    try:
+                        await page.goto(url, wait_until='commit', timeout=2000)
+                    except PlaywrightTimeoutError:
+                        pass
+
+                    return await self._finish_page(page)
+                except Exception as e:
+                    logger.warning("⚠️ Error navegando a %s: %s", url, e)
+                    return PageInfo(url=url, title="", is_ml_mexico=False,
+                                    timestamp=datetime.now().isoformat())
+                finally:
+                    if page:
+                        try:
+                            await page.close()
+                        except Exception:
+                            pass
+                    if context:
+                        try:
+                            await context.close()
+                        except Exception:
+                            pass
+
+        return list(await asyncio.gather(*(worker(u) for u in urls)))
+
+    async def _finish_page(self, page: Page) -> PageInfo:
+        """Espera la readiness del DOM y construye el PageInfo de una página"""
+        try:
+            await page.wait_for_selector('body', timeout=self.config.TIMEOUT)
+        except PlaywrightTimeoutError:
+            pass
+
+        title = await page.title()
+        final_url = page.url
+        return PageInfo(
+            url=final_url,
+            title=title,
+            is_ml_mexico=self.is_valid_ml_url(final_url),
+            page_type=self._detect_page_type(final_url),
+            timestamp=datetime.now().isoformat()
+        )
+
+    async def _attempt_navigation(self, url: str) -> Optional[str]:
+        """
+        Intenta navegar con diferentes estrategias.
+
+        Returns:
+            Nombre de la estrategia (wait_until) que funcionó, o None si falló
+        """
+        # networkidle se evita por completo: ML mantiene beacons de long-poll
+        # que nunca quedan idle, así que era la peor estrategia posible
+        try:
+            await self.page.goto(url, wait_until='domcontentloaded', timeout=self.config.TIMEOUT)
+        except PlaywrightTimeoutError:
+            logger.warning("⚠️ Timeout esperando domcontentloaded, verificando contenido")
+        except Exception as e:
+            logger.warning("⚠️ Error en navegación: %s", e)
+            # Reintento único con timeout corto
             try:
-                logger.info(f"🔄 Intentando navegación con estrategia: {wait_until or 'none'}")
-                
-                if wait_until:
-                    await self.page.goto(
-                        url, 
-                        wait_until=wait_until, 
-                        timeout=timeout
-                    )
-                else:
-                    await self.page.goto(url, timeout=timeout)
-                
-                # Verificar si la página se cargó
-                if await self._is_page_loaded():
-                    return True
-                    
-            except PlaywrightTimeoutError:
-                logger.warning(f"⚠️ Timeout con estrategia {wait_until or 'none'}")
-                continue
-            except Exception as e:
-                logger.warning(f"⚠️ Error con estrategia {wait_until or 'none'}: {e}")
-                continue
-        
-        return False
+                await self.page.goto(url, wait_until='domcontentloaded', timeout=15000)
+            except Exception:
+                return None
+
+        # Sondeo de readiness fuera de banda
+        for _ in range(3):
+            if await self._is_page_loaded():
+                return 'domcontentloaded'
+            await asyncio.sleep(0.5)
+
+        return None
     
     async def _is_page_loaded(self) -> bool:
         """Verifica si la página se cargó correctamente"""
@@ -219,70 +439,68 @@ class MercadoLibreBrowser:
             title = await self.page.title()
             url = self.page.url
             
-            error_indicators = [
-                'error', 'not found', '404', '503', '500',
-                'blocked', 'denied', 'forbidden'
-            ]
-            
-            if any(indicator in title.lower() for indicator in error_indicators):
-                logger.warning(f"⚠️ Página de error detectada: {title}")
+            if _ERR_RE.search(title):
+                logger.warning("⚠️ Página de error detectada: %s", title)
                 return False
-            
-            if any(indicator in url.lower() for indicator in error_indicators):
-                logger.warning(f"⚠️ URL de error detectada: {url}")
+
+            if _ERR_RE.search(url):
+                logger.warning("⚠️ URL de error detectada: %s", url)
                 return False
             
             # Verificar que hay contenido básico
             try:
-                await self.page.wait_for_selector('body', timeout=5000)
-                body_content = await self.page.evaluate('document.body.innerText.length')
-                
+                # body existe desde readyState 'interactive'; no hace falta esperarlo
+                ready_state = await self.page.evaluate('document.readyState')
+                if ready_state == 'loading':
+                    return False
+
+                # textContent no fuerza layout/reflow como innerText
+                body_content = await self.page.evaluate(
+                    'document.body && document.body.textContent ? document.body.textContent.length : 0'
+                )
+
                 if body_content < 100:  # Muy poco contenido
                     logger.warning("⚠️ Página con muy poco contenido")
                     return False
-                
+
                 return True
-                
+
             except:
                 return False
                 
         except Exception as e:
-            logger.error(f"❌ Error verificando carga de página: {e}")
+            logger.error("❌ Error verificando carga de página: %s", e)
             return False
     
-    async def _wait_for_stable_load(self):
+    async def _wait_for_stable_load(self, skip_networkidle: bool = False):
         """Espera a que la página se estabilice"""
         try:
-            # Esperar a que no haya requests pendientes
-            await self.page.wait_for_load_state('networkidle', timeout=10000)
-            
-            # Espera adicional para JavaScript
-            await asyncio.sleep(random.uniform(*self.config.HUMAN_DELAYS['page_load']))
-            
+            # Esperar a que no haya requests pendientes (salvo que ya se esperó)
+            if not skip_networkidle:
+                await self.page.wait_for_load_state('networkidle', timeout=10000)
+
+            # Espera adicional para JavaScript (solo en modo humano)
+            if self.config.SIMULATE_HUMAN:
+                await asyncio.sleep(self._jitter('page_load'))
+
         except PlaywrightTimeoutError:
             # Si timeout, continuar anyway
             await asyncio.sleep(2)
         except Exception as e:
-            logger.warning(f"⚠️ Error esperando estabilización: {e}")
+            logger.warning("⚠️ Error esperando estabilización: %s", e)
     
     async def _recovery_strategy(self):
         """Estrategias de recuperación ante errores"""
         try:
-            if self.page:
-                # Intentar refrescar
-                try:
-                    await self.page.reload(timeout=10000)
-                    await asyncio.sleep(2)
-                except:
-                    pass
-                
-                # Limpiar caché y cookies
+            # Primer reintento: solo limpiar estado; el siguiente navigate()
+            # ya reabre la página, un reload aquí sería una carga de más
+            if self.context:
                 try:
                     await self.context.clear_cookies()
                     await self.context.clear_permissions()
                 except:
                     pass
-            
+
             # Si falló mucho, reinicializar completamente
             if self.retry_count >= 2:
                 logger.info("🔄 Reinicializando navegador completamente")
@@ -290,15 +508,34 @@ class MercadoLibreBrowser:
                 await asyncio.sleep(3)
                 
         except Exception as e:
-            logger.warning(f"⚠️ Error en estrategia de recuperación: {e}")
+            logger.warning("⚠️ Error en estrategia de recuperación: %s", e)
     
+    async def _first_matching(self, selectors) -> Optional[str]:
+        """
+        Evalúa una lista de selectores en una sola llamada al navegador y
+        devuelve el primero que encuentra un elemento visible.
+        """
+        try:
+            return await self.page.evaluate(
+                """(sels) => {
+                    for (const s of sels) {
+                        try {
+                            const e = document.querySelector(s);
+                            if (e && e.offsetParent !== null) return s;
+                        } catch (err) {}
+                    }
+                    return null;
+                }""",
+                list(selectors)
+            )
+        except Exception:
+            return None
+
     def is_valid_ml_url(self, url: str) -> bool:
         """Validar que la URL sea de MercadoLibre México"""
-        try:
-            parsed = urlparse(url)
-            return parsed.netloc in self.config.VALID_DOMAINS
-        except:
-            return False
+        return _is_valid_ml_url_cached(
+            url, self.config.VALID_DOMAINS, self.config.VALID_URL_PREFIXES
+        )
     
     async def get_page_info(self) -> PageInfo:
         """Obtener información básica de la página actual"""
@@ -311,40 +548,43 @@ class MercadoLibreBrowser:
             )
             
         try:
+            # url y tipo de página se resuelven en Python (sin round-trip)
             url = self.page.url
-            title = await self.page.title()
             is_ml_mexico = self.is_valid_ml_url(url)
-            
-            # Detectar tipo de página
             page_type = self._detect_page_type(url)
-            
-            # Contar productos si es página de resultados
-            product_cards_found = 0
-            if page_type == 'search_results':
-                try:
-                    # Probar múltiples selectores
-                    for selector in self.config.SELECTOR_PATTERNS['products']:
-                        try:
-                            product_cards = await self.page.query_selector_all(selector)
-                            if product_cards:
-                                product_cards_found = len(product_cards)
-                                break
-                        except:
-                            continue
-                except Exception:
-                    pass
-            
+
+            # Título y conteo de tarjetas viajan en un único evaluate: antes
+            # page.title() y el conteo eran round-trips CDP separados, un
+            # impuesto serial por cada navegación de un crawl
+            count_sels = (
+                list(self.config.SELECTOR_PATTERNS['products'])
+                if page_type == 'search_results' else []
+            )
+            info = await self.page.evaluate(
+                """(sels) => {
+                    let count = 0;
+                    for (const s of sels) {
+                        try {
+                            const n = document.querySelectorAll(s).length;
+                            if (n) { count = n; break; }
+                        } catch (err) {}
+                    }
+                    return { title: document.title, count: count };
+                }""",
+                count_sels
+            )
+
             return PageInfo(
                 url=url,
-                title=title,
+                title=info['title'],
                 is_ml_mexico=is_ml_mexico,
                 page_type=page_type,
-                product_cards_found=product_cards_found,
+                product_cards_found=info['count'],
                 timestamp=datetime.now().isoformat()
             )
             
         except Exception as e:
-            logger.error(f"Error obteniendo info de página: {e}")
+            logger.error("Error obteniendo info de página: %s", e)
             return PageInfo(
                 url="",
                 title="",
@@ -354,9 +594,9 @@ class MercadoLibreBrowser:
     
     def _detect_page_type(self, url: str) -> str:
         """Detectar el tipo de página actual"""
-        if any(path in url for path in ['/search', 'listado.mercadolibre', 'q=']):
+        if _SEARCH_RE.search(url):
             return 'search_results'
-        elif any(path in url for path in ['/p/', 'MLA', 'articulo.mercadolibre']):
+        elif _PRODUCT_RE.search(url):
             return 'product_detail'
         elif url in self.config.BASE_URLS or url.rstrip('/') in [u.rstrip('/') for u in self.config.BASE_URLS]:
             return 'homepage'
@@ -366,37 +606,34 @@ class MercadoLibreBrowser:
     async def search(self, query: str) -> bool:
         """Realizar búsqueda en MercadoLibre con retry mejorado"""
         try:
-            logger.info(f"🔍 Buscando: '{query}'")
+            logger.info("🔍 Buscando: '%s'", query)
             
-            # Buscar caja de búsqueda con múltiples selectores
+            # Buscar caja de búsqueda resolviendo todos los selectores en un solo roundtrip
             search_box = None
-            for selector in self.config.SEARCH_SELECTORS:
-                try:
-                    search_box = await self.page.query_selector(selector)
-                    if search_box and await search_box.is_visible():
-                        logger.info(f"✅ Caja de búsqueda encontrada: {selector}")
-                        break
-                except:
-                    continue
-            
+            winning_selector = await self._first_matching(self.config.SEARCH_SELECTORS)
+            if winning_selector:
+                search_box = await self.page.query_selector(winning_selector)
+                logger.info("✅ Caja de búsqueda encontrada: %s", winning_selector)
+
             if not search_box:
                 logger.error("❌ No se encontró caja de búsqueda")
                 return False
             
             # Limpiar y escribir búsqueda
             await search_box.click()
-            await asyncio.sleep(random.uniform(*self.config.HUMAN_DELAYS['between_actions']))
-            
-            # Limpiar campo
-            await search_box.fill("")
-            await asyncio.sleep(0.5)
-            
-            # Escribir con delay humano
-            for char in query:
-                await search_box.type(char)
-                await asyncio.sleep(random.uniform(*self.config.HUMAN_DELAYS['typing']))
-            
-            await asyncio.sleep(random.uniform(*self.config.HUMAN_DELAYS['between_actions']))
+            await asyncio.sleep(self._jitter('between_actions'))
+
+            if self.config.HUMAN_LIKE_TYPING:
+                # Escribir carácter por carácter con delay humano
+                await search_box.fill("")
+                for char in query:
+                    await search_box.type(char)
+                    await asyncio.sleep(self._jitter('typing'))
+            else:
+                # fill() reemplaza el contenido en un solo roundtrip
+                await search_box.fill(query)
+
+            await asyncio.sleep(self._jitter('between_actions'))
             
             # Presionar Enter
             await search_box.press('Enter')
@@ -408,51 +645,62 @@ class MercadoLibreBrowser:
             
             # Verificar que llegamos a resultados
             if 'search' in self.current_url or 'listado' in self.current_url:
-                logger.info(f"✅ Búsqueda exitosa: {self.current_url}")
+                logger.info("✅ Búsqueda exitosa: %s", self.current_url)
                 return True
             else:
-                logger.warning(f"⚠️ URL inesperada después de búsqueda: {self.current_url}")
+                logger.warning("⚠️ URL inesperada después de búsqueda: %s", self.current_url)
                 return False
             
         except Exception as e:
-            logger.error(f"❌ Error en búsqueda: {e}")
+            logger.error("❌ Error en búsqueda: %s", e)
             return False
     
     async def navigate_pagination(self, direction: str = "next") -> bool:
         """Navegar páginas de resultados con manejo mejorado"""
         try:
-            logger.info(f"📄 Navegando a página {direction}")
+            logger.info("📄 Navegando a página %s", direction)
             
             current_url = self.page.url
-            selectors = self.config.PAGINATION_SELECTORS.get(direction, [])
-            
-            for selector in selectors:
+            # Selector agrupado primero: una sola evaluación del grupo de
+            # alternativas. Las alternativas individuales quedan de respaldo:
+            # si el grupo completo no es CSS válido, el except del cuerpo lo
+            # descarta y se prueban una por una (mismo patrón que discover
+            # en _page_helpers)
+            combined = self.config.COMBINED_PAGINATION_SELECTORS.get(direction)
+            candidates = ([combined] if combined else [])
+            candidates.extend(self.config.PAGINATION_SELECTORS.get(direction, ()))
+
+            for selector in candidates:
                 try:
                     element = await self.page.query_selector(selector)
                     if element and await element.is_visible() and await element.is_enabled():
                         
                         # Scroll al elemento
                         await element.scroll_into_view_if_needed()
-                        await asyncio.sleep(0.5)
-                        
-                        # Click con delay humano
-                        await element.click()
-                        await self._wait_for_stable_load()
-                        
+
+                        # Click sincronizado con la navegación: espera exactamente
+                        # lo necesario en lugar de sleep fijo + networkidle
+                        async with self.page.expect_navigation(
+                            wait_until='domcontentloaded',
+                            timeout=self.config.TIMEOUT
+                        ):
+                            await element.click()
+
                         # Verificar si cambió la URL
                         new_url = self.page.url
                         if new_url != current_url:
                             self.current_url = new_url
-                            logger.info(f"✅ Navegación {direction} exitosa")
+                            logger.info("✅ Navegación %s exitosa", direction)
                             return True
                             
                 except Exception as e:
-                    logger.warning(f"⚠️ Error con selector {selector}: {e}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("⚠️ Error con selector %s: %s", selector, e)
                     continue
             
-            logger.warning(f"⚠️ No se pudo navegar {direction}")
+            logger.warning("⚠️ No se pudo navegar %s", direction)
             return False
             
         except Exception as e:
-            logger.error(f"❌ Error navegando: {e}")
+            logger.error("❌ Error navegando: %s", e)
             return False
\ No newline at end of file
@@ -1,59 +1,233 @@
 
+import itertools
+import os
+import random
+import re
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import urlsplit
+
+# Alternación precompilada para validaciones basadas en regex
+_VALID_RE = re.compile(r"(?:^|\.)(?:www\.|listado\.|articulo\.)?mercadolibre\.com\.mx$")
+
+# Perfil de configuración seleccionable por entorno: 'fast' para scraping en
+# lote, 'stealth' cuando ML se pone agresivo con la detección
+PROFILE = os.environ.get('ML_SCRAPER_PROFILE', 'fast')
+
+_PROFILES = {
+    'fast': {
+        'TIMEOUT': 60000,
+        'BLOCK_SUBRESOURCES': True,
+        'HUMAN_LIKE_TYPING': False,
+        'SIMULATE_HUMAN': False,
+    },
+    'stealth': {
+        'TIMEOUT': 60000,
+        'BLOCK_SUBRESOURCES': False,
+        'HUMAN_LIKE_TYPING': True,
+        'SIMULATE_HUMAN': True,
+    },
+}
+_ACTIVE_PROFILE = _PROFILES.get(PROFILE, _PROFILES['fast'])
+
+
+@lru_cache(maxsize=256)
+def compile_selector(css: str):
+    """
+    Traduce un selector CSS a XPath y cachea el resultado.
+
+    La traducción ocurre una sola vez por selector en todo el proceso, en
+    lugar de re-parsear el string en cada extracción. Devuelve None si
+    cssselect no está instalado; los consumidores deben usar entonces el
+    CSS crudo (Playwright lo parsea nativamente en el navegador).
+    """
+    try:
+        from cssselect import GenericTranslator
+    except ImportError:
+        return None
+    return GenericTranslator().css_to_xpath(css)
+
+
+# Constantes congeladas a nivel de módulo: las tuplas/frozensets se asignan
+# una sola vez al importar y las pruebas de membresía son O(1) en lugar de
+# escaneos lineales sobre listas mutables
+
+# Argumentos del navegador mejorados para evadir detección
+BROWSER_ARGS = (
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--no-zygote',
+    '--disable-gpu',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-ipc-flooding-protection',
+    '--disable-web-security',
+    '--disable-features=TranslateUI',
+    '--disable-default-apps',
+    '--no-default-browser-check',
+    '--window-size=1366,768',
+    '--start-maximized',
+    '--disable-extensions',
+    '--disable-plugins',
+    # Nota: --disable-images / --disable-javascript se eliminaron; Chromium
+    # moderno los ignora y el bloqueo real se hace con el route handler
+)
+
+# User Agents múltiples para rotación, ponderados según cuota de mercado
+# realista (la selección uniforme sobre-representa los UA raros, que el
+# detector de bots de ML marca y dispara el camino caro de reintentos)
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+)
+USER_AGENT_WEIGHTS = (50, 25, 15, 10)
+
+# Ciclo de rotación precomputado: cada UA aparece weight//5 veces en una
+# secuencia barajada una sola vez al importar. next() sobre el ciclo es O(1)
+# sin estado de RNG por llamada, y la distribución respeta los pesos de forma
+# determinista en lugar de depender de la varianza del muestreo
+_ua_sequence = [
+    ua
+    for ua, weight in zip(USER_AGENTS, USER_AGENT_WEIGHTS)
+    for _ in range(max(weight // 5, 1))
+]
+random.shuffle(_ua_sequence)
+_UA_CYCLE = itertools.cycle(_ua_sequence)
+_ua_lock = threading.Lock()
+
+
+def next_user_agent() -> str:
+    """Devuelve el siguiente User-Agent del ciclo ponderado (thread-safe)"""
+    with _ua_lock:
+        return next(_UA_CYCLE)
+
+# URLs con fallback
+BASE_URLS = (
+    "https://www.mercadolibre.com.mx",
+    "https://mercadolibre.com.mx",
+    "https://listado.mercadolibre.com.mx"  # URL alternativa
+)
+
+VALID_DOMAINS = frozenset({
+    'www.mercadolibre.com.mx',
+    'mercadolibre.com.mx',
+    'listado.mercadolibre.com.mx',
+    'articulo.mercadolibre.com.mx'
+})
+
+# Prefijos precomputados: un solo str.startswith en C en lugar de urlparse
+# (el separador '/' o '?' evita aceptar dominios como ...com.mx.evil.com)
+VALID_URL_PREFIXES = tuple(
+    f"{scheme}://{domain}{suffix}"
+    for domain in sorted(VALID_DOMAINS)
+    for scheme in ('https', 'http')
+    for suffix in ('/', '?')
+)
+
+# Selectores de búsqueda con fallbacks
+SEARCH_SELECTORS = (
+    'input[placeholder*="Buscar productos"]',
+    'input.nav-search-input',
+    'input[data-testid="cb1-edit"]',
+    '#cb1-edit',
+    'input[name="as_word"]',
+    '.nav-search-input',
+    'input[type="text"][placeholder*="buscar" i]'
+)
+
+# Selectores de paginación
+PAGINATION_SELECTORS = {
+    'next': (
+        'a.andes-pagination__button--next:not(.andes-pagination__button--disabled)',
+        'a[title="Siguiente"]:not(.disabled)',
+        '.andes-pagination__button[aria-label*="Siguiente"]:not(.disabled)'
+    ),
+    'previous': (
+        'a.andes-pagination__button--previous:not(.andes-pagination__button--disabled)',
+        'a[title="Anterior"]:not(.disabled)',
+        '.andes-pagination__button[aria-label*="Anterior"]:not(.disabled)'
+    )
+}
+
+# Selectores por tipo de elemento
+SELECTOR_PATTERNS = {
+    'products': (
+        '.ui-search-result',
+        '.ui-search-result__wrapper',
+        '[data-testid="result-item"]',
+        '.shops__item-container',
+        '.item__info-container',
+        '.ui-search-item'
+    ),
+    'prices': (
+        '.andes-money-amount__fraction',
+        '.price-tag-fraction',
+        '.ui-search-price__part',
+        '.andes-money-amount__digits',
+        '.price-tag-symbol + .price-tag-fraction'
+    ),
+    'titles': (
+        '.ui-search-item__title',
+        '.ui-search-item__title-label',
+        'h2.ui-search-item__title',
+        '.ui-search-item__title a',
+        '.ui-search-link'
+    ),
+    'navigation': (
+        '.andes-pagination__button',
+        '.andes-pagination__button--next',
+        '.andes-pagination__button--previous',
+        'a[title="Siguiente"]',
+        'a[title="Anterior"]'
+    ),
+    'search': (
+        'input[placeholder*="Buscar productos"]',
+        'input.nav-search-input',
+        '#cb1-edit',
+        '.nav-search-button',
+        'button[aria-label="Buscar"]'
+    )
+}
+
 
 class BrowserConfig:
     """Configuración del navegador Playwright con anti-detección mejorada"""
-    
+
     # Configuración del navegador
     HEADLESS = True  # Cambiar a False para debugging
-    TIMEOUT = 60000  # Aumentado a 60 segundos
-    
-    # Argumentos del navegador mejorados para evadir detección
-    BROWSER_ARGS = [
-        '--no-sandbox',
-        '--disable-setuid-sandbox',
-        '--disable-dev-shm-usage',
-        '--disable-accelerated-2d-canvas',
-        '--no-first-run',
-        '--no-zygote',
-        '--disable-gpu',
-        '--disable-features=VizDisplayCompositor',
-        '--disable-background-networking',
-        '--disable-background-timer-throttling',
-        '--disable-renderer-backgrounding',
-        '--disable-backgrounding-occluded-windows',
-        '--disable-blink-features=AutomationControlled',
-        '--disable-ipc-flooding-protection',
-        '--disable-web-security',
-        '--disable-features=TranslateUI',
-        '--disable-default-apps',
-        '--no-default-browser-check',
-        '--window-size=1366,768',
-        '--start-maximized',
-        '--disable-extensions',
-        '--disable-plugins',
-        '--disable-images',  # Cargar más rápido
-        '--disable-javascript',  # Comentar si necesitas JS
-    ]
-    
+    TIMEOUT = _ACTIVE_PROFILE['TIMEOUT']
+
+    # Bloquear imágenes/CSS/fuentes/media vía route handler
+    # (desactivar si una página de detalle necesita CSS para sus selectores)
+    BLOCK_SUBRESOURCES = _ACTIVE_PROFILE['BLOCK_SUBRESOURCES']
+
+    BROWSER_ARGS = BROWSER_ARGS
+
     # Configuración del viewport
     VIEWPORT = {
         'width': 1366,
         'height': 768
     }
-    
-    # User Agents múltiples para rotación
-    USER_AGENTS = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
-        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-    ]
-    
+
+    USER_AGENTS = USER_AGENTS
+    USER_AGENT_WEIGHTS = USER_AGENT_WEIGHTS
+
     # User Agent por defecto
     USER_AGENT = USER_AGENTS[0]
-    
-    # Headers adicionales para parecer más humano
-    EXTRA_HEADERS = {
+
+    # Headers adicionales para parecer más humano (vista de sólo lectura:
+    # nadie puede mutarlos por accidente entre contextos)
+    EXTRA_HEADERS = MappingProxyType({
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
         'Accept-Language': 'es-MX,es;q=0.9,en;q=0.8',
         'Accept-Encoding': 'gzip, deflate, br',
@@ -65,38 +239,38 @@ class BrowserConfig:
         'Sec-Fetch-Site': 'none',
         'Sec-Fetch-User': '?1',
         'Cache-Control': 'max-age=0',
-    }
-    
+    })
+
+    # Pares precomputados para consumidores que iteran headers
+    EXTRA_HEADERS_ITEMS = tuple(EXTRA_HEADERS.items())
+
     # Configuración de localización
     LOCALE = 'es-MX'
     TIMEZONE = 'America/Mexico_City'
-    
-    # URLs con fallback
-    BASE_URLS = [
-        "https://www.mercadolibre.com.mx",
-        "https://mercadolibre.com.mx",
-        "https://listado.mercadolibre.com.mx"  # URL alternativa
-    ]
+
+    BASE_URLS = BASE_URLS
     BASE_URL = BASE_URLS[0]
-    
-    VALID_DOMAINS = [
-        'www.mercadolibre.com.mx', 
-        'mercadolibre.com.mx',
-        'listado.mercadolibre.com.mx',
-        'articulo.mercadolibre.com.mx'
-    ]
-    
+
+    VALID_DOMAINS = VALID_DOMAINS
+    VALID_URL_PREFIXES = VALID_URL_PREFIXES
+
     # Configuración de retry
     MAX_RETRIES = 3
     RETRY_DELAY = 2  # segundos entre reintentos
-    
+
+    # Escribir búsquedas carácter por carácter (lento: un roundtrip por tecla)
+    HUMAN_LIKE_TYPING = _ACTIVE_PROFILE['HUMAN_LIKE_TYPING']
+
+    # Aplicar delays extra tipo humano tras cargar páginas (innecesario en batch)
+    SIMULATE_HUMAN = _ACTIVE_PROFILE['SIMULATE_HUMAN']
+
     # Configuración de delays para parecer humano
     HUMAN_DELAYS = {
         'page_load': (2, 4),  # segundos de espera después de cargar página
         'between_actions': (0.5, 1.5),  # entre acciones
         'typing': (0.1, 0.3),  # entre caracteres al escribir
     }
-    
+
     # Selectores por defecto para extracción (actualizados)
     DEFAULT_SELECTORS = {
         'product_card': '.ui-search-result, .ui-search-result__wrapper',
@@ -108,33 +282,16 @@ class BrowserConfig:
         'shipping': '.ui-search-item__shipping, .ui-search-shipping',
         'seller': '.ui-search-official-store-label, .ui-search-item__seller'
     }
-    
-    # Selectores de búsqueda con fallbacks
-    SEARCH_SELECTORS = [
-        'input[placeholder*="Buscar productos"]',
-        'input.nav-search-input',
-        'input[data-testid="cb1-edit"]',
-        '#cb1-edit',
-        'input[name="as_word"]',
-        '.nav-search-input',
-        'input[type="text"][placeholder*="buscar" i]'
-    ]
-    
-    # Selectores de paginación
-    PAGINATION_SELECTORS = {
-        'next': [
-            'a.andes-pagination__button--next:not(.andes-pagination__button--disabled)',
-            'a[title="Siguiente"]:not(.disabled)',
-            '.andes-pagination__button[aria-label*="Siguiente"]:not(.disabled)',
-            'a[href*="Desde_"]:contains("Siguiente")'
-        ],
-        'previous': [
-            'a.andes-pagination__button--previous:not(.andes-pagination__button--disabled)',
-            'a[title="Anterior"]:not(.disabled)',
-            '.andes-pagination__button[aria-label*="Anterior"]:not(.disabled)'
-        ]
+
+    # Registro de selectores precompilados a XPath (vacío si falta cssselect)
+    COMPILED_SELECTORS = {
+        k: compile_selector(v) for k, v in DEFAULT_SELECTORS.items()
+        if compile_selector(v) is not None
     }
-    
+
+    SEARCH_SELECTORS = SEARCH_SELECTORS
+    PAGINATION_SELECTORS = PAGINATION_SELECTORS
+
     # Configuración de proxy (opcional)
     PROXY_CONFIG = {
         'enabled': False,
@@ -142,43 +299,25 @@ class BrowserConfig:
         'username': None,
         'password': None
     }
-    
-    # Selectores por tipo de elemento
-    SELECTOR_PATTERNS = {
-        'products': [
-            '.ui-search-result',
-            '.ui-search-result__wrapper',
-            '[data-testid="result-item"]',
-            '.shops__item-container',
-            '.item__info-container',
-            '.ui-search-item'
-        ],
-        'prices': [
-            '.andes-money-amount__fraction',
-            '.price-tag-fraction',
-            '.ui-search-price__part',
-            '.andes-money-amount__digits',
-            '.price-tag-symbol + .price-tag-fraction'
-        ],
-        'titles': [
-            '.ui-search-item__title',
-            '.ui-search-item__title-label',
-            'h2.ui-search-item__title',
-            '.ui-search-item__title a',
-            '.ui-search-link'
-        ],
-        'navigation': [
-            '.andes-pagination__button',
-            '.andes-pagination__button--next',
-            '.andes-pagination__button--previous',
-            'a[title="Siguiente"]',
-            'a[title="Anterior"]'
-        ],
-        'search': [
-            'input[placeholder*="Buscar productos"]',
-            'input.nav-search-input',
-            '#cb1-edit',
-            '.nav-search-button',
-            'button[aria-label="Buscar"]'
-        ]
-    }
\ No newline at end of file
+
+    SELECTOR_PATTERNS = SELECTOR_PATTERNS
+
+    # Alternativas fusionadas en un selector agrupado: Blink evalúa el grupo
+    # en un solo recorrido del DOM en lugar de un query por alternativa
+    COMBINED_SELECTORS = {k: ", ".join(v) for k, v in SELECTOR_PATTERNS.items()}
+    COMBINED_PAGINATION_SELECTORS = {
+        k: ", ".join(v) for k, v in PAGINATION_SELECTORS.items()
+    }
+
+    @staticmethod
+    def is_valid_domain(url: str) -> bool:
+        """
+        Valida el host de una URL contra VALID_DOMAINS.
+
+        Parsear el host evita el bug de los chequeos por substring, que
+        aceptaban dominios como notmercadolibre.com.mx.
+        """
+        try:
+            return urlsplit(url).hostname in VALID_DOMAINS
+        except (ValueError, AttributeError):
+            return False
@@ -12,9 +12,6 @@ from pathlib import Path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
-# Ahora podemos importar el servidor
-from server import create_server
-
 
 def main():
     """Función principal"""
@@ -23,13 +20,17 @@ def main():
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
-    
+
     logger = logging.getLogger(__name__)
     logger.info("Iniciando servidor MCP de MercadoLibre México")
-    
+
     try:
-        # Crear y ejecutar servidor
-        server = create_server()
+        # Import diferido: server arrastra fastmcp y Playwright (~cientos de
+        # ms), que no hacen falta para --help ni para importar este módulo
+        from server import get_server
+
+        # Obtener la instancia compartida del servidor
+        server = get_server()
         
         # Ejecutar con transporte stdio por defecto
         host = "0.0.0.0"  # Escucha en todas las interfaces
@@ -47,7 +48,7 @@ def main():
     except KeyboardInterrupt:
         logger.info("Servidor detenido por el usuario")
     except Exception as e:
-        logger.error(f"Error ejecutando servidor: {e}")
+        logger.error("Error ejecutando servidor: %s", e)
         sys.exit(1)
 
 
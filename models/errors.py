@@ -3,12 +3,29 @@
 Modelos para el sistema de errores comunes
 """
 
+import time
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 from enum import Enum
 
 
+@lru_cache(maxsize=1)
+def _now_iso_bucket(sec: int) -> str:
+    return datetime.fromtimestamp(sec).isoformat()
+
+
+def now_iso() -> str:
+    """Timestamp ISO con resolución de 1 segundo: los errores que llegan en
+    el mismo segundo comparten el string en lugar de reformatearlo"""
+    return _now_iso_bucket(int(time.time()))
+
+
+# Alias interno usado por los defaults de los dataclasses
+_now_iso = now_iso
+
+
 class ErrorCategory(Enum):
     """Categorías de errores"""
     NAVIGATION = "navigation"
@@ -40,8 +57,11 @@ class ErrorPattern:
     solution: Optional[str] = None
     prevention_tips: List[str] = field(default_factory=list)
     frequency: int = 1
-    first_seen: str = field(default_factory=lambda: datetime.now().isoformat())
-    last_seen: str = field(default_factory=lambda: datetime.now().isoformat())
+    first_seen: str = field(default_factory=_now_iso)
+    last_seen: str = field(default_factory=_now_iso)
+    # Epoch de la última ocurrencia: las rutas que filtran por antigüedad
+    # comparan floats en vez de strings ISO (last_seen queda para mostrar)
+    last_seen_ts: float = field(default_factory=time.time)
     tool_name: Optional[str] = None
     page_type: Optional[str] = None
     query_context: Optional[str] = None
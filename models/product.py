@@ -4,11 +4,11 @@ Modelos de datos para productos de MercadoLibre México
 """
 
 from dataclasses import dataclass
-from typing import Optional, List, Any, Dict
+from typing import Optional, List, Any, Dict, Tuple
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProductData:
     """Estructura de datos de producto de MercadoLibre México"""
     title: str
@@ -35,16 +35,24 @@ class PriceStatistics:
     products_with_discount: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExtractionResult:
     """Resultado de extracción de productos"""
     extraction_info: Dict[str, Any]
     price_statistics: PriceStatistics
-    products: List[Dict[str, Any]]
+    # Tupla inmutable: el lote de productos se comparte entre consumidores
+    # sin copiarlo y puede iterarse/serializarse de forma incremental
+    products: Tuple[ProductData, ...]
     errors: Optional[List[Dict[str, Any]]] = None
 
+    def iter_products(self):
+        """Itera los productos ya serializados uno a uno (sin lista intermedia)"""
+        from dataclasses import asdict
+        for product in self.products:
+            yield asdict(product)
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class NavigationResult:
     """Resultado de operaciones de navegación"""
     success: bool
@@ -56,7 +64,7 @@ class NavigationResult:
     message: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PageInfo:
     """Información básica de una página"""
     url: str
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SelectorTest:
     """Resultado de prueba de selector"""
     selector: str
@@ -13,7 +13,7 @@ class SelectorTest:
     recommendations: Optional[List[str]] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class DiscoveredSelector:
     """Selector descubierto con metadatos"""
     selector: str
@@ -22,17 +22,18 @@ class DiscoveredSelector:
     element_count: int
 
 
-@dataclass
+@dataclass(slots=True)
 class SelectorAnalysis:
     """Análisis detallado de un selector"""
     element_count: int
     visible_elements: int
     sample_texts: List[Dict[str, Any]]
-    element_types: List[str]
+    # Conteo de elementos por tag (p.ej. {'div': 8, 'a': 2})
+    element_types: Dict[str, int]
     has_useful_content: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class SelectorTestResult:
     """Resultado completo de prueba de selector"""
     selector: str
@@ -4,8 +4,11 @@ Servidor FastMCP actualizado con sistema de aprendizaje de errores
 """
 
 import asyncio
-import atexit
+import functools
+import inspect
 import logging
+import threading
+import time
 from pathlib import Path
 from typing import Dict, Any, Optional
 from fastmcp import FastMCP, Context
@@ -24,49 +27,72 @@ from tools.error_tools import ErrorLearningTools
 from tools.error_wrapper import capture_tool_errors, EnhancedErrorCapture
 
 
-Path("data").mkdir(exist_ok=True)
+# Un syscall de mkdir por proceso, no por import (las suites que importan
+# el módulo repetidas veces lo pagaban cada vez)
+_DATA_DIR_READY = False
+
+
+def _ensure_data_dir():
+    global _DATA_DIR_READY
+    if not _DATA_DIR_READY:
+        Path("data").mkdir(exist_ok=True, parents=True)
+        _DATA_DIR_READY = True
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Frescura y tamaño máximo del caché de consejos de prevención
+_ADVICE_TTL = 60.0  # segundos
+_ADVICE_CACHE_MAX = 256
 
-class MercadoLibreMCPServer:
+# Centinela compartido para .get sin default alocado
+_EMPTY: Dict[str, Any] = {}
 
-    
-    def __init__(self):
-        # Inicializar sistema de errores
-        self.error_manager = CommonErrorManager()
-        self.enhanced_error_capture = EnhancedErrorCapture(self.error_manager)
-        
-        # Inicializar componentes
-        self.browser = MercadoLibreBrowser(BrowserConfig())
-        
-        # Inicializar herramientas normales (el decorador se aplica en las funciones MCP)
-        self.navigation_tools = NavigationTools(self.browser)
-        self.extraction_tools = ExtractionTools(self.browser)
-        self.selector_tools = SelectorTools(self.browser)
-        self.product_tools = ProductTools(self.browser)
-        self.utility_tools = UtilityTools(self.browser)
-        
-        # Inicializar herramientas de errores
-        self.error_tools = ErrorLearningTools(self.error_manager)
-        
-        # Crear servidor FastMCP
-        self.mcp = FastMCP(
-            name="MercadoLibreMX-Enhanced",
-            instructions="""
+_NO_ADVICE: Dict[str, Any] = {'recommendations': []}
+
+
+async def _advice_pair(coro_a, coro_b):
+    """
+    Corre dos consultas de consejos en paralelo con concurrencia estructurada.
+
+    Con TaskGroup (3.11+) el fallo de una cancela a su hermana en vez de
+    dejarla huérfana; en 3.10 se cae a gather. En ambos casos un fallo se
+    degrada a "sin consejos" para no abortar el flujo que los pidió.
+    """
+    if hasattr(asyncio, 'TaskGroup'):
+        try:
+            async with asyncio.TaskGroup() as tg:
+                task_a = tg.create_task(coro_a)
+                task_b = tg.create_task(coro_b)
+        except Exception as eg:
+            logger.warning("⚠️ Consejos de prevención no disponibles: %s", eg)
+            return _NO_ADVICE, _NO_ADVICE
+        return task_a.result(), task_b.result()
+
+    pair = await asyncio.gather(coro_a, coro_b, return_exceptions=True)
+    cleaned = []
+    for item in pair:
+        if isinstance(item, Exception):
+            logger.warning("⚠️ Consejo de prevención falló: %s", item)
+            item = _NO_ADVICE
+        cleaned.append(item)
+    return cleaned[0], cleaned[1]
+
+# Instrucciones del servidor como constante de módulo: el literal se interna
+# una vez al cargar el .pyc en lugar de reconstruirse por instancia
+_INSTRUCTIONS = """
             Servidor MCP especializado para MercadoLibre México con sistema de aprendizaje de errores.
-            
+
             🚀 NUEVAS CAPACIDADES DE APRENDIZAJE:
             - Sistema automático de captura y análisis de errores
             - Consejos de prevención basados en errores pasados
             - Estadísticas y patrones de errores comunes
             - Búsqueda de errores similares con soluciones
             - Insights de aprendizaje para mejora continua
-            
+
             💡 RECOMENDACIÓN: Usa get_prevention_advice antes de ejecutar herramientas críticas
-            
+
             Capacidades principales:
             - Navegación específica a mercadolibre.com.mx
             - Extracción de HTML para análisis
@@ -74,19 +100,141 @@ class MercadoLibreMCPServer:
             - Extracción de datos de productos
             - Navegación por páginas de resultados
             - Herramientas de debugging y análisis
-            
+
             El sistema aprende automáticamente de cada error para mejorar futuras ejecuciones.
             """
+
+# Tabla declarativa de tools: (nombre MCP, ruta punteada al método, capturar
+# errores, descripción). Registrar desde aquí evita ~15 wrappers async casi
+# idénticos y añadir un tool es editar una fila
+_TOOL_TABLE = (
+    # === APRENDIZAJE DE ERRORES ===
+    ('get_error_statistics', 'error_tools.get_error_statistics', False,
+     "📊 Obtiene estadísticas detalladas de errores comunes.\n\n"
+     "Útil para entender qué errores son más frecuentes y cómo mejorar."),
+    ('search_similar_errors', 'error_tools.search_similar_errors', False,
+     "🔍 Busca errores similares en el historial con sus soluciones.\n\n"
+     "Args:\n"
+     "    error_description: Descripción del error que quieres buscar\n"
+     "    tool_name: Filtrar por herramienta específica (opcional)\n"
+     "    limit: Número máximo de resultados"),
+    ('get_learning_insights', 'error_tools.get_learning_insights', False,
+     "🧠 Obtiene insights y patrones de aprendizaje del historial de errores.\n\n"
+     "Identifica tendencias, herramientas problemáticas y oportunidades de mejora."),
+    ('export_error_data', 'error_tools.export_error_data', False,
+     "📤 Exporta datos de errores para análisis externo.\n\n"
+     "Args:\n"
+     "    format_type: \"json\" para datos completos, \"summary\" para resumen\n"
+     "    include_statistics: Si incluir estadísticas"),
+    # === NAVEGACIÓN ===
+    ('navigate_to_page', 'navigation_tools.navigate_to_page', True,
+     "🌐 Navega a una página específica de MercadoLibre México.\n\n"
+     "⚠️ CON APRENDIZAJE DE ERRORES: Esta herramienta aprende automáticamente\n"
+     "de errores pasados y proporciona consejos preventivos."),
+    ('go_to_home', 'navigation_tools.go_to_home', True,
+     "🏠 Navega a la página principal de MercadoLibre México."),
+    ('search_products', 'navigation_tools.search_products', True,
+     "🔍 Busca productos en MercadoLibre México.\n\n"
+     "⚠️ TIP: Si falla frecuentemente, revisa las estadísticas de errores para este tool."),
+    ('get_current_page_info', 'navigation_tools.get_current_page_info', False,
+     "📄 Obtiene información sobre la página actual."),
+    ('navigate_pagination', 'navigation_tools.navigate_pagination', True,
+     "⏭️ Navega por las páginas de resultados."),
+    # === EXTRACCIÓN ===
+    ('extract_page_html', 'extraction_tools.extract_page_html', True,
+     "📜 Extrae HTML de la página actual o de un elemento específico."),
+    ('extract_text_content', 'extraction_tools.extract_text_content', True,
+     "📝 Extrae contenido de texto de elementos específicos."),
+    # === SELECTORES ===
+    ('discover_selectors', 'selector_tools.discover_selectors', True,
+     "🔍 Descubre selectores CSS útiles en la página actual."),
+    ('discover_selectors_many', 'selector_tools.discover_selectors_many', True,
+     "🔍 Descubre selectores CSS para varios tipos de elementos en paralelo.\n\n"
+     "Args:\n"
+     "    element_types: Lista de tipos (products, prices, titles, navigation)"),
+    ('test_selector', 'selector_tools.test_selector', True,
+     "🧪 Prueba un selector CSS específico para evaluar su utilidad."),
+    ('test_selectors', 'selector_tools.test_selectors', True,
+     "🧪 Prueba un lote de selectores CSS en un solo viaje al navegador.\n\n"
+     "Args:\n"
+     "    selectors: Lista de selectores CSS a probar"),
+    # === PRODUCTOS ===
+    ('extract_products', 'product_tools.extract_products', True,
+     "🛍️ Extrae datos de productos de la página actual.\n\n"
+     "⚠️ RECOMENDACIÓN: Usa get_prevention_advice(\"extract_products\") primero\n"
+     "si has tenido problemas anteriormente con esta herramienta."),
+    # === UTILIDADES ===
+    ('take_screenshot', 'utility_tools.take_screenshot', True,
+     "📸 Toma una captura de pantalla de la página actual."),
+    ('wait_for_element', 'utility_tools.wait_for_element', True,
+     "⏳ Espera a que aparezca un elemento específico."),
+)
+
+# Clases de herramientas que dependen del navegador, indexadas por el
+# atributo del servidor que las aloja: la instancia (y con ella el wrapper
+# del navegador) se construye recién en la primera llamada, y la firma del
+# método de clase basta para generar el esquema MCP sin instanciar nada
+_LAZY_TOOL_CLASSES = {
+    'navigation_tools': NavigationTools,
+    'extraction_tools': ExtractionTools,
+    'selector_tools': SelectorTools,
+    'product_tools': ProductTools,
+    'utility_tools': UtilityTools,
+}
+
+
+class MercadoLibreMCPServer:
+
+    # Contador de instancias: más de una significa doble navegador y doble
+    # escaneo de la base de errores (usar get_server() en vez de construir)
+    _instances = 0
+
+    def __init__(self):
+        MercadoLibreMCPServer._instances += 1
+        if MercadoLibreMCPServer._instances > 1:
+            logger.warning(
+                "⚠️ Creadas %d instancias del servidor; use get_server() para compartir una",
+                MercadoLibreMCPServer._instances
+            )
+
+        # Inicializar sistema de errores (el gestor persiste bajo data/)
+        _ensure_data_dir()
+        self.error_manager = CommonErrorManager()
+        self.enhanced_error_capture = EnhancedErrorCapture(self.error_manager)
+        
+        # El wrapper del navegador se crea perezosamente en el primer acceso
+        # (el proceso de Chromium en sí ya se lanza recién al primer navigate).
+        # Las herramientas que lo usan también son perezosas (ver __getattr__):
+        # un cliente que solo consulta errores no construye navegador alguno
+        self._browser: Optional[MercadoLibreBrowser] = None
+
+        # Inicializar herramientas de errores
+        self.error_tools = ErrorLearningTools(self.error_manager)
+
+        # Caché TTL de consejos de prevención: los agentes piden consejo con
+        # los mismos argumentos una y otra vez y cada consulta escanea la base
+        # de patrones; 60s de frescura basta para amortizarlas
+        self._advice_cache: Dict[tuple, tuple] = {}
+
+        # Tope de llamadas concurrentes que tocan el navegador compartido:
+        # varios clientes MCP en ráfaga degradan Playwright y el loop
+        self._browser_sem = asyncio.Semaphore(4)
+        
+        # Crear servidor FastMCP
+        self.mcp = FastMCP(
+            name="MercadoLibreMX-Enhanced",
+            instructions=_INSTRUCTIONS
         )
         
         # Registrar herramientas
         self._register_enhanced_tools()
         
-        # Limpieza automática de errores antiguos al inicio
-        self.error_manager.clear_old_errors(days=30)
-        
-        # Configurar cleanup
-        atexit.register(self.cleanup)
+        # Limpieza de errores antiguos fuera del camino crítico de arranque:
+        # es I/O de disco y no debe retrasar la primera petición MCP
+        self._maintenance_thread = threading.Thread(
+            target=self._startup_maintenance, name="ml-error-maintenance", daemon=True
+        )
+        self._maintenance_thread.start()
     
     def _register_enhanced_tools(self):
         """Registra todas las herramientas con captura automática de errores"""
@@ -110,199 +258,51 @@ class MercadoLibreMCPServer:
                 context_info: Información del contexto actual (opcional)
                 user_query: Query del usuario (opcional)
             """
-            return await self.error_tools.get_prevention_advice(
+            try:
+                key = (tool_name, user_query, tuple(sorted((context_info or {}).items())))
+                # Forzar el hash aquí: la tupla se arma sin quejarse aunque
+                # algún valor de context_info sea una lista o un dict, y el
+                # TypeError saltaría recién en el .get del caché
+                hash(key)
+            except TypeError:
+                # context_info con valores no hasheables u ordenables: sin caché
+                key = None
+
+            if key is not None:
+                cached = self._advice_cache.get(key)
+                if cached is not None and time.monotonic() - cached[0] < _ADVICE_TTL:
+                    return cached[1]
+
+            advice = await self.error_tools.get_prevention_advice(
                 tool_name, context_info, user_query, ctx
             )
-        
-        @self.mcp.tool
-        async def get_error_statistics(ctx: Context = None) -> Dict[str, Any]:
-            """
-            📊 Obtiene estadísticas detalladas de errores comunes.
-            
-            Útil para entender qué errores son más frecuentes y cómo mejorar.
-            """
-            return await self.error_tools.get_error_statistics(ctx)
-        
-        @self.mcp.tool
-        async def search_similar_errors(
-            error_description: str,
-            tool_name: Optional[str] = None,
-            limit: int = 5,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """
-            🔍 Busca errores similares en el historial con sus soluciones.
-            
-            Args:
-                error_description: Descripción del error que quieres buscar
-                tool_name: Filtrar por herramienta específica (opcional)
-                limit: Número máximo de resultados
-            """
-            return await self.error_tools.search_similar_errors(
-                error_description, tool_name, limit, ctx
-            )
-        
-        @self.mcp.tool
-        async def get_learning_insights(ctx: Context = None) -> Dict[str, Any]:
-            """
-            🧠 Obtiene insights y patrones de aprendizaje del historial de errores.
-            
-            Identifica tendencias, herramientas problemáticas y oportunidades de mejora.
-            """
-            return await self.error_tools.get_learning_insights(ctx)
-        
-        @self.mcp.tool
-        async def export_error_data(
-            format_type: str = "summary",
-            include_statistics: bool = True,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """
-            📤 Exporta datos de errores para análisis externo.
-            
-            Args:
-                format_type: "json" para datos completos, "summary" para resumen
-                include_statistics: Si incluir estadísticas
-            """
-            return await self.error_tools.export_error_data(
-                format_type, include_statistics, ctx
-            )
-        
-        # === HERRAMIENTAS DE NAVEGACIÓN (MEJORADAS) ===
-        
-        @self.mcp.tool
-        @capture_tool_errors("navigate_to_page", self.error_manager)
-        async def navigate_to_page(url: str, ctx: Context = None) -> Dict[str, Any]:
-            """
-            🌐 Navega a una página específica de MercadoLibre México.
-            
-            ⚠️ CON APRENDIZAJE DE ERRORES: Esta herramienta ahora aprende automáticamente
-            de errores pasados y proporciona consejos preventivos.
-            """
-            return await self.navigation_tools.navigate_to_page(url, ctx)
-        
-        @self.mcp.tool
-        @capture_tool_errors("go_to_home", self.error_manager)
-        async def go_to_home(ctx: Context = None) -> Dict[str, Any]:
-            """🏠 Navega a la página principal de MercadoLibre México."""
-            return await self.navigation_tools.go_to_home(ctx)
-        
-        @self.mcp.tool
-        @capture_tool_errors("search_products", self.error_manager)
-        async def search_products(query: str, ctx: Context = None) -> Dict[str, Any]:
-            """
-            🔍 Busca productos en MercadoLibre México.
-            
-            ⚠️ TIP: Si falla frecuentemente, revisa las estadísticas de errores para este tool.
-            """
-            return await self.navigation_tools.search_products(query, ctx)
-        
-        @self.mcp.tool
-        async def get_current_page_info(ctx: Context = None) -> Dict[str, Any]:
-            """📄 Obtiene información sobre la página actual."""
-            return await self.navigation_tools.get_current_page_info(ctx)
-        
-        @self.mcp.tool
-        @capture_tool_errors("navigate_pagination", self.error_manager)
-        async def navigate_pagination(direction: str = "next", ctx: Context = None) -> Dict[str, Any]:
-            """⏭️ Navega por las páginas de resultados."""
-            return await self.navigation_tools.navigate_pagination(direction, ctx)
-        
-        # === HERRAMIENTAS DE EXTRACCIÓN (MEJORADAS) ===
-        
-        @self.mcp.tool
-        @capture_tool_errors("extract_page_html", self.error_manager)
-        async def extract_page_html(
-            selector: Optional[str] = None,
-            max_length: int = 50000,
-            pretty_format: bool = False,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """📜 Extrae HTML de la página actual o de un elemento específico."""
-            return await self.extraction_tools.extract_page_html(
-                selector, max_length, pretty_format, ctx
-            )
-        
-        @self.mcp.tool
-        @capture_tool_errors("extract_text_content", self.error_manager)
-        async def extract_text_content(
-            selector: str,
-            all_matches: bool = False,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """📝 Extrae contenido de texto de elementos específicos."""
-            return await self.extraction_tools.extract_text_content(
-                selector, all_matches, ctx
-            )
-        
-        # === HERRAMIENTAS DE SELECTORES (MEJORADAS) ===
-        
-        @self.mcp.tool
-        @capture_tool_errors("discover_selectors", self.error_manager)
-        async def discover_selectors(
-            element_type: str = "products",
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """🔍 Descubre selectores CSS útiles en la página actual."""
-            return await self.selector_tools.discover_selectors(element_type, ctx)
-        
-        @self.mcp.tool
-        @capture_tool_errors("test_selector", self.error_manager)
-        async def test_selector(
-            selector: str,
-            extract_text: bool = True,
-            check_visibility: bool = True,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """🧪 Prueba un selector CSS específico para evaluar su utilidad."""
-            return await self.selector_tools.test_selector(
-                selector, extract_text, check_visibility, ctx
-            )
-        
-        # === HERRAMIENTAS DE PRODUCTOS (MEJORADAS) ===
-        
-        @self.mcp.tool
-        @capture_tool_errors("extract_products", self.error_manager)
-        async def extract_products(
-            limit: int = 20,
-            custom_selectors: Optional[Dict[str, str]] = None,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """
-            🛍️ Extrae datos de productos de la página actual.
-            
-            ⚠️ RECOMENDACIÓN: Usa get_prevention_advice("extract_products") primero
-            si has tenido problemas anteriormente con esta herramienta.
-            """
-            return await self.product_tools.extract_products(
-                limit, custom_selectors, ctx
-            )
-        
-        # === HERRAMIENTAS DE UTILIDADES (MEJORADAS) ===
-        
-        @self.mcp.tool
-        @capture_tool_errors("take_screenshot", self.error_manager)
-        async def take_screenshot(
-            filename: Optional[str] = None,
-            full_page: bool = False,
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """📸 Toma una captura de pantalla de la página actual."""
-            return await self.utility_tools.take_screenshot(filename, full_page, ctx)
-        
-        @self.mcp.tool
-        @capture_tool_errors("wait_for_element", self.error_manager)
-        async def wait_for_element(
-            selector: str,
-            timeout: int = 5000,
-            state: str = "visible",
-            ctx: Context = None
-        ) -> Dict[str, Any]:
-            """⏳ Espera a que aparezca un elemento específico."""
-            return await self.utility_tools.wait_for_element(
-                selector, timeout, state, ctx
-            )
-        
+
+            if key is not None:
+                if len(self._advice_cache) >= _ADVICE_CACHE_MAX:
+                    self._advice_cache.pop(next(iter(self._advice_cache)))
+                self._advice_cache[key] = (time.monotonic(), advice)
+
+            return advice
+        
+        # === TOOLS DECLARATIVOS (navegación/extracción/selectores/productos/
+        # utilidades/estadísticas): un loop sobre la tabla en lugar de ~15
+        # wrappers async idénticos ===
+        for tool_name, dotted_path, wrap_errors, description in _TOOL_TABLE:
+            attr, _, method_name = dotted_path.partition('.')
+            if attr == 'error_tools':
+                # Solo-estadísticas: sin navegador ni semáforo, se liga ya
+                method = getattr(self.error_tools, method_name)
+            else:
+                # Resolución diferida: registrar no debe construir el tool
+                # (eso instanciaría el navegador); el invocador lo resuelve
+                # en la primera llamada y pasa por el semáforo compartido
+                method = self._with_browser_gate(
+                    self._lazy_tool_method(attr, method_name)
+                )
+            if wrap_errors:
+                method = capture_tool_errors(tool_name, self.error_manager)(method)
+            self.mcp.tool(method, name=tool_name, description=description)
+
         # === HERRAMIENTA DE FLUJO INTELIGENTE (NUEVA) ===
         
         @self.mcp.tool
@@ -310,21 +310,37 @@ class MercadoLibreMCPServer:
             search_query: str,
             max_products: int = 20,
             auto_prevent_errors: bool = True,
+            requires_home_first: bool = False,
             ctx: Context = None
         ) -> Dict[str, Any]:
             """
             🤖 Flujo inteligente: busca productos y extrae datos con prevención automática de errores.
-            
+
             Esta herramienta combina búsqueda y extracción con aprendizaje automático de errores.
-            
+
             Args:
                 search_query: Término de búsqueda
                 max_products: Máximo número de productos a extraer
                 auto_prevent_errors: Si aplicar consejos de prevención automáticamente
+                requires_home_first: Forzar paso por la homepage antes de buscar
+                    (search_products ya navega solo si hace falta)
             """
-            if ctx:
-                await ctx.info(f"🚀 Iniciando búsqueda inteligente: '{search_query}'")
-            
+            # Métodos ligados como locales: el flujo es el camino caliente
+            # encadenado por agentes y se ahorra las búsquedas de atributo
+            get_advice = self.error_tools.get_prevention_advice
+            go_home = self._with_browser_gate(self.navigation_tools.go_to_home)
+            do_search = self._with_browser_gate(self.navigation_tools.search_products)
+            do_extract = self._with_browser_gate(self.product_tools.extract_products)
+            capture = self.error_manager.capture_error
+
+            async def _log(msg: str, level: str = 'info'):
+                # Helper no-op con ctx ausente: cada ctx.* es un roundtrip
+                # por el transporte MCP y antes alguno ni comprobaba ctx
+                if ctx is not None:
+                    await getattr(ctx, level)(msg)
+
+            await _log(f"🚀 Iniciando búsqueda inteligente: '{search_query}'")
+
             results = {
                 'search_query': search_query,
                 'auto_prevention_used': auto_prevent_errors,
@@ -336,64 +352,84 @@ class MercadoLibreMCPServer:
             try:
                 # Paso 1: Obtener consejos preventivos si está habilitado
                 if auto_prevent_errors and ctx:
-                    await ctx.info("🛡️ Obteniendo consejos de prevención...")
-                    
-                    search_advice = await self.error_tools.get_prevention_advice(
-                        "search_products", {'query': search_query}, search_query, ctx
-                    )
-                    extract_advice = await self.error_tools.get_prevention_advice(
-                        "extract_products", {'max_products': max_products}, search_query, ctx
+                    await _log("🛡️ Obteniendo consejos de prevención...")
+
+                    # Consultas independientes en paralelo y con cancelación
+                    # estructurada: la espera es max(t1, t2) y un fallo no
+                    # aborta el flujo (ver _advice_pair)
+                    search_advice, extract_advice = await _advice_pair(
+                        get_advice(
+                            "search_products", {'query': search_query}, search_query, ctx
+                        ),
+                        get_advice(
+                            "extract_products", {'max_products': max_products}, search_query, ctx
+                        ),
                     )
-                    
+
                     if search_advice['recommendations'] or extract_advice['recommendations']:
                         total_recommendations = len(search_advice['recommendations']) + len(extract_advice['recommendations'])
-                        await ctx.warning(f"⚠️ {total_recommendations} consejos de prevención aplicados")
+                        await _log(f"⚠️ {total_recommendations} consejos de prevención aplicados", 'warning')
                         results['errors_prevented'] = [
                             f"Búsqueda: {len(search_advice['recommendations'])} consejos",
                             f"Extracción: {len(extract_advice['recommendations'])} consejos"
                         ]
                 
-                # Paso 2: Ir a la página principal
-                await ctx.info("🏠 Navegando a MercadoLibre...")
-                home_result = await self.navigation_tools.go_to_home(ctx)
-                results['steps_completed'].append("Navegación a home")
-                
-                # Paso 3: Realizar búsqueda
-                await ctx.info(f"🔍 Buscando: {search_query}")
-                search_result = await self.navigation_tools.search_products(search_query, ctx)
+                # Paso 2: Ir a la página principal sólo si se pide explícito;
+                # search_products navega por su cuenta cuando hace falta, así
+                # que el default se ahorra una carga de página completa
+                if requires_home_first:
+                    await _log("🏠 Navegando a MercadoLibre...")
+                    await go_home(ctx)
+                    results['steps_completed'].append("Navegación a home")
+                else:
+                    results['steps_completed'].append("Home omitido (fusionado con búsqueda)")
+
+                # Paso 3: Realizar búsqueda (el mensaje de progreso se
+                # coalescerá con el resumen final: menos roundtrips MCP)
+                search_result = await do_search(search_query, ctx)
                 results['steps_completed'].append("Búsqueda de productos")
-                
+
                 # Paso 4: Extraer productos
-                await ctx.info(f"📦 Extrayendo hasta {max_products} productos...")
-                extraction_result = await self.product_tools.extract_products(max_products, None, ctx)
+                extraction_result = await do_extract(max_products, None, ctx)
                 results['steps_completed'].append("Extracción de productos")
                 
-                # Compilar resultados finales
+                # Compilar resultados finales (locales + centinelas congelados
+                # en vez de crear {}/[] de usar y tirar en cada .get)
+                products = extraction_result.get('products') or ()
+                extraction_info = extraction_result.get('extraction_info') or _EMPTY
                 results['final_results'] = {
                     'search_url': search_result.get('results_url'),
-                    'products_found': extraction_result.get('extraction_info', {}).get('products_found', 0),
-                    'products_extracted': len(extraction_result.get('products', [])),
+                    'products_found': extraction_info.get('products_found', 0),
+                    'products_extracted': len(products),
                     'price_statistics': extraction_result.get('price_statistics'),
-                    'products': extraction_result.get('products', [])
+                    # Recorte explícito al máximo pedido: no arrastrar de más
+                    'products': products[:max_products]
                 }
+                # Soltar el resultado intermedio ya volcado: mantenerlo vivo
+                # duplicaría la residencia en memoria durante la serialización
+                del extraction_result, products
                 
-                if ctx:
-                    products_count = results['final_results']['products_extracted']
-                    await ctx.info(f"✅ Flujo completado: {products_count} productos extraídos")
-                
+                products_count = results['final_results']['products_extracted']
+                await _log(
+                    f"✅ Flujo completado: {products_count} productos extraídos\n"
+                    + "\n".join(results['steps_completed'])
+                )
+
                 return results
                 
             except Exception as e:
-                # Capturar error del flujo completo
-                error_id = self.error_manager.capture_error(
+                # Capturar error del flujo completo fuera del loop: la captura
+                # persiste a disco y no debe bloquear otras tools durante una
+                # tormenta de errores
+                error_id = await asyncio.to_thread(
+                    capture,
                     error=e,
                     tool_name="smart_search_and_extract",
                     context_info={'search_query': search_query, 'max_products': max_products},
                     user_query=search_query
                 )
                 
-                if ctx:
-                    await ctx.error(f"❌ Error en flujo inteligente: {error_id}")
+                await _log(f"❌ Error en flujo inteligente: {error_id}", 'error')
                 
                 results['error'] = {
                     'error_id': error_id,
@@ -403,22 +439,99 @@ class MercadoLibreMCPServer:
                 
                 return results
     
+    @property
+    def browser(self) -> MercadoLibreBrowser:
+        """Wrapper del navegador, construido en el primer acceso"""
+        if self._browser is None:
+            self._browser = MercadoLibreBrowser(BrowserConfig())
+        return self._browser
+
+    def __getattr__(self, name: str):
+        # Construcción perezosa de las herramientas de navegador: el primer
+        # acceso crea la instancia y la memoiza como atributo normal, así los
+        # accesos siguientes ni pasan por aquí
+        cls = _LAZY_TOOL_CLASSES.get(name)
+        if cls is None:
+            raise AttributeError(name)
+        tool = cls(self.browser)
+        setattr(self, name, tool)
+        return tool
+
+    def _lazy_tool_method(self, attr: str, method_name: str):
+        """Invocador que resuelve el tool en el momento de la llamada.
+
+        Conserva nombre, docstring y firma (sin self) del método de clase
+        para que FastMCP genere el mismo esquema que con el método ligado.
+        """
+        func = getattr(_LAZY_TOOL_CLASSES[attr], method_name)
+
+        @functools.wraps(func)
+        async def caller(*args, **kwargs):
+            return await getattr(getattr(self, attr), method_name)(*args, **kwargs)
+
+        sig = inspect.signature(func)
+        caller.__signature__ = sig.replace(
+            parameters=tuple(sig.parameters.values())[1:]
+        )
+        return caller
+
+    def _with_browser_gate(self, func):
+        """Envuelve un tool para que corra bajo el semáforo del navegador"""
+        @functools.wraps(func)
+        async def gated(*args, **kwargs):
+            async with self._browser_sem:
+                return await func(*args, **kwargs)
+        return gated
+
+    def _startup_maintenance(self):
+        """Mantenimiento diferido del arranque (corre en un hilo de fondo)"""
+        try:
+            self.error_manager.clear_old_errors(days=30)
+        except Exception as e:
+            logger.warning("⚠️ Limpieza de errores antiguos falló: %s", e)
+
+    async def aclose(self):
+        """Cierra el navegador de forma asíncrona (devolviéndolo al pool)"""
+        if self._browser is not None:
+            await self._browser.close()
+
     def cleanup(self):
-        """Limpia recursos al cerrar"""
+        """Limpia recursos al cerrar, sin pisar un loop todavía activo"""
+        if self._browser is None or not self._browser.browser:
+            return
+        try:
+            loop = asyncio.get_event_loop_policy().get_event_loop()
+            if loop.is_running():
+                # Hay un loop vivo: cerrarlo aquí rompería sus transportes;
+                # el finally de run() se encarga cuando el loop termine
+                return
+        except RuntimeError:
+            pass
         try:
-            if self.browser.browser:
-                loop = asyncio.new_event_loop()
-                loop.run_until_complete(self.browser.close())
-                loop.close()
+            asyncio.run(self.aclose())
         except Exception as e:
-            logger.error(f"Error durante cleanup: {e}")
+            logger.error("Error durante cleanup: %s", e)
     
     def run(self, transport: str = "stdio", **kwargs):
         """Ejecuta el servidor MCP mejorado"""
+        # uvloop (opcional): loop basado en libuv con mucho menos overhead por
+        # callback; FastMCP hereda la política al hacer asyncio.run
+        try:
+            import uvloop
+            uvloop.install()
+            logger.info("⚡ Event loop uvloop instalado")
+        except ImportError:
+            pass
+
         logger.info("🚀 Iniciando servidor MCP con sistema de aprendizaje de errores")
-        logger.info(f"📊 Errores conocidos en base de datos: {len(self.error_manager.error_patterns)}")
-        
-        self.mcp.run(transport=transport, **kwargs)
+        logger.info("📊 Errores conocidos en base de datos: %d", len(self.error_manager.error_patterns))
+
+        try:
+            self.mcp.run(transport=transport, **kwargs)
+        finally:
+            # FastMCP ya cerró su loop en este punto; cleanup() corre el
+            # cierre del navegador en un asyncio.run propio
+            self.cleanup()
 
 
 # Función de conveniencia para crear y ejecutar el servidor
@@ -427,6 +540,24 @@ def create_server() -> MercadoLibreMCPServer:
     return MercadoLibreMCPServer()
 
 
-# Instancia global del servidor (para compatibilidad con el código original)
-server_instance = create_server()
-mcp = server_instance.mcp
\ No newline at end of file
+# Singleton perezoso: importar este módulo ya no construye navegador,
+# gestor de errores ni registra tools; eso ocurre en el primer acceso
+_server_singleton: Optional[MercadoLibreMCPServer] = None
+
+
+def get_server() -> MercadoLibreMCPServer:
+    """Devuelve la instancia global del servidor, creándola si no existe"""
+    global _server_singleton
+    if _server_singleton is None:
+        _server_singleton = create_server()
+    return _server_singleton
+
+
+def __getattr__(name: str):
+    # Compatibilidad con `from server import mcp` / `server.server_instance`
+    # sin pagar la construcción en el import del módulo (PEP 562)
+    if name == 'server_instance':
+        return get_server()
+    if name == 'mcp':
+        return get_server().mcp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
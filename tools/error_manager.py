@@ -3,20 +3,79 @@
 Sistema de gestión de errores comunes
 """
 
+import atexit
+import heapq
 import json
-import hashlib
 import logging
+import os
 import re
+import sys
+import time
+from collections import Counter, defaultdict
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from dataclasses import asdict
+from functools import lru_cache
 
-from models.errors import ErrorPattern, ErrorCategory, ErrorSeverity, ErrorStatistics, ErrorRecommendation
+from models.errors import ErrorPattern, ErrorCategory, ErrorSeverity, ErrorStatistics, now_iso
+
+# orjson (opcional): parsea y serializa el catálogo 3-10x más rápido que el
+# json de la stdlib y produce bytes directamente; sin él, misma semántica
+try:
+    import orjson as _orjson
+
+    def _json_loads(data):
+        return _orjson.loads(data)
+
+    def _json_dump_bytes(obj) -> bytes:
+        return _orjson.dumps(obj, option=_orjson.OPT_INDENT_2)
+
+    def _json_line(obj) -> str:
+        return _orjson.dumps(obj).decode()
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dump_bytes(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
+
+    def _json_line(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+# xxHash (opcional): fingerprint no criptográfico ~4x más rápido que MD5
+# para las firmas de error; con la librería ausente se usa hashlib
+try:
+    from xxhash import xxh128 as _fingerprint
+except ImportError:
+    from hashlib import md5 as _fingerprint
 
 
 logger = logging.getLogger(__name__)
 
+# Alternación precompilada para categorizar: un solo escaneo en C del mensaje
+# en lugar de seis bucles Python de membresía. El nombre de grupo es el nombre
+# del enum; gana la coincidencia más a la izquierda
+_CATEGORY_RE = re.compile(
+    r'(?P<NAVIGATION>navigate|navegar|url|página)'
+    r'|(?P<SELECTOR>selector|query_selector|elemento)'
+    r'|(?P<EXTRACTION>extract|extracción|datos)'
+    r'|(?P<SEARCH>search|búsqueda|buscar)'
+    r'|(?P<PAGINATION>pagination|paginación|siguiente|anterior)'
+    r'|(?P<BROWSER>browser|playwright|chromium)'
+)
+
+# Señales de severidad y consejos en un único multi-patrón: una pasada de
+# finditer recoge todas las keywords presentes (equivalente al autómata
+# Aho-Corasick para este puñado de patrones, sin dependencia nueva) y la
+# clasificación se decide sobre el conjunto de señales
+_SIGNAL_RE = re.compile(
+    r'(?P<CRITICAL>crash|fatal|browser closed)'
+    r'|(?P<TIMEOUT>timeout)'
+    r'|(?P<NETWORK>connection|network)'
+    r'|(?P<NOTFOUND>not found|no encontr)'
+)
+
 
 class CommonErrorManager:
     """Gestor de errores comunes para aprendizaje automático"""
@@ -25,7 +84,162 @@ class CommonErrorManager:
         self.storage_path = Path(storage_path)
         self.storage_path.parent.mkdir(parents=True, exist_ok=True)
         self.error_patterns: Dict[str, ErrorPattern] = {}
-        self.load_errors()
+        # Índice tool_name -> patrones: las rutas calientes (wrapper de
+        # captura, consejos de prevención) consultan por herramienta en cada
+        # llamada MCP y no deben escanear todos los patrones
+        self._by_tool: Dict[str, List[ErrorPattern]] = defaultdict(list)
+        # Contadores incrementales por categoría/severidad (ponderados por
+        # frecuencia): las estadísticas se agregan al insertar, no al consultar
+        self._cat_counts: Dict[str, int] = defaultdict(int)
+        self._sev_counts: Dict[str, int] = defaultdict(int)
+        # Índice invertido token -> error_ids: la búsqueda de errores
+        # similares intersecta listas de postings en vez de escanear y
+        # re-minusculizar el catálogo completo por consulta
+        self._token_index: Dict[str, set] = defaultdict(set)
+        # Recomendaciones memoizadas por patrón: se reconstruyen solo cuando
+        # la frecuencia del patrón cambia, no en cada consulta de consejos
+        self._rec_cache: Dict[str, tuple] = {}
+        # Agregados para insights mantenidos en la captura: frecuencia por
+        # herramienta y conteos de estabilidad, sin recorrer el catálogo
+        self._tool_freq: Counter = Counter()
+        self._freq_eq_1 = 0
+        self._freq_gt_3 = 0
+        # Fragmentos JSON por patrón: se regeneran solo cuando el patrón muta,
+        # de modo que save_errors empalma en vez de re-serializar el catálogo
+        self._serial_cache: Dict[str, str] = {}
+        # Escrituras amortizadas: reescribir todo el JSON en cada captura es
+        # O(N patrones); se acumulan capturas y se persiste por lote
+        self._dirty = 0
+        self._save_threshold = 20
+        self._last_save = time.monotonic()
+        # Changelog append-only: cada captura añade una línea JSONL (O(1))
+        # en lugar de reescribir el snapshot completo; compact() reescribe el
+        # snapshot y trunca el log cuando éste crece demasiado
+        self.log_path = self.storage_path.with_suffix('.jsonl')
+        self._log_lines = 0
+        # Carga diferida: el catálogo se parsea en el primer acceso, no al
+        # construir — los decoradores crean gestores al importar y arrancar
+        # no debe pagar el parseo de un catálogo que quizá nunca se consulte
+        self._loaded = False
+        self._log_file = open(self.log_path, 'a', encoding='utf-8')
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _pattern_tokens(pattern: ErrorPattern) -> set:
+        """Tokens en minúsculas del texto buscable de un patrón"""
+        return set(f"{pattern.error_message} {pattern.original_error}".lower().split())
+
+    def _index_pattern(self, pattern: ErrorPattern):
+        """Registra un patrón en los índices y contadores agregados"""
+        if pattern.tool_name:
+            self._by_tool[pattern.tool_name].append(pattern)
+            self._tool_freq[pattern.tool_name] += pattern.frequency
+        self._cat_counts[pattern.category.value] += pattern.frequency
+        self._sev_counts[pattern.severity.value] += pattern.frequency
+        if pattern.frequency == 1:
+            self._freq_eq_1 += 1
+        elif pattern.frequency > 3:
+            self._freq_gt_3 += 1
+        for token in self._pattern_tokens(pattern):
+            self._token_index[token].add(pattern.error_id)
+
+    def match_counts(self, terms) -> Dict[str, int]:
+        """Cuenta, por error_id, cuántos términos de la consulta aparecen en
+        el texto del patrón, usando solo las listas de postings del índice"""
+        self._ensure_loaded()
+        counts: Dict[str, int] = {}
+        index = self._token_index
+        for term in set(terms):
+            for error_id in index.get(term, ()):
+                counts[error_id] = counts.get(error_id, 0) + 1
+        return counts
+
+    @property
+    def tool_error_frequencies(self) -> Counter:
+        """Frecuencia de errores acumulada por herramienta (incremental)"""
+        self._ensure_loaded()
+        return self._tool_freq
+
+    @property
+    def stable_error_count(self) -> int:
+        """Patrones que solo han ocurrido una vez"""
+        self._ensure_loaded()
+        return self._freq_eq_1
+
+    @property
+    def recurring_error_count(self) -> int:
+        """Patrones con más de tres ocurrencias"""
+        self._ensure_loaded()
+        return self._freq_gt_3
+
+    def has_errors_for(self, tool_name: str) -> bool:
+        """True si la herramienta tiene patrones registrados (O(1))"""
+        self._ensure_loaded()
+        return tool_name in self._by_tool
+
+    def get_patterns_for(self, tool_name: str) -> tuple:
+        """Patrones conocidos de una herramienta en O(1) (tupla compartible)"""
+        self._ensure_loaded()
+        patterns = self._by_tool.get(tool_name)
+        return tuple(patterns) if patterns else ()
+
+    @staticmethod
+    def _pattern_to_dict(pattern: ErrorPattern) -> Dict[str, Any]:
+        """Dict JSON-serializable de un patrón (enums como strings)
+
+        Usa __dict__ en vez de asdict(): asdict deep-copia recursivamente
+        context_info y prevention_tips en cada guardado. Esos campos se
+        tratan como inmutables una vez insertados, así que la copia sobra.
+        """
+        return {
+            **pattern.__dict__,
+            'category': pattern.category.value,
+            'severity': pattern.severity.value,
+        }
+
+    @staticmethod
+    def _pattern_from_dict(error_data: Dict[str, Any]) -> ErrorPattern:
+        """Reconstruye un patrón desde su dict serializado"""
+        error_data['category'] = ErrorCategory(error_data['category'])
+        error_data['severity'] = ErrorSeverity(error_data['severity'])
+        # Internar los strings que se repiten entre patrones (ver capture_error)
+        if isinstance(error_data.get('tool_name'), str):
+            error_data['tool_name'] = sys.intern(error_data['tool_name'])
+        if isinstance(error_data.get('page_type'), str):
+            error_data['page_type'] = sys.intern(error_data['page_type'])
+        message = error_data.get('error_message')
+        if isinstance(message, str) and len(message) < 200:
+            error_data['error_message'] = sys.intern(message)
+        if 'last_seen_ts' not in error_data:
+            # Catálogos previos a last_seen_ts: derivarlo del string ISO
+            try:
+                error_data['last_seen_ts'] = datetime.fromisoformat(
+                    error_data['last_seen']).timestamp()
+            except (KeyError, ValueError):
+                error_data['last_seen_ts'] = 0.0
+        return ErrorPattern(**error_data)
+
+    def _append_log(self, pattern: ErrorPattern):
+        """Añade el estado actual del patrón al changelog (una línea JSONL)"""
+        try:
+            fragment = _json_line(self._pattern_to_dict(pattern))
+            # El fragmento recién serializado sirve también para el snapshot:
+            # save_errors lo empalma tal cual sin re-serializar el patrón
+            self._serial_cache[pattern.error_id] = fragment
+            self._log_file.write(fragment + '\n')
+            self._log_file.flush()
+            self._log_lines += 1
+        except Exception as e:
+            logger.error("Error escribiendo changelog: %s", e)
+
+    def compact(self):
+        """Reescribe el snapshot completo y trunca el changelog"""
+        self.save_errors()
+        try:
+            self._log_file.truncate(0)
+            self._log_lines = 0
+        except Exception as e:
+            logger.error("Error truncando changelog: %s", e)
     
     def capture_error(
         self,
@@ -47,49 +261,77 @@ class CommonErrorManager:
             ID único del patrón de error
         """
         try:
-            # Generar ID único basado en el error y contexto
-            error_signature = self._generate_error_signature(error, tool_name, context_info)
-            
-            # Categorizar error
-            category = self._categorize_error(error, tool_name)
-            severity = self._determine_severity(error, category)
-            
-            # Generar solución y consejos
-            solution, tips = self._generate_solution_and_tips(error, tool_name, category)
-            
-            current_time = datetime.now().isoformat()
+            self._ensure_loaded()
+            # Clasificación memoizada: el caso común de este sistema es el
+            # mismo error repitiéndose, así que firma/categoría/severidad/
+            # consejos se calculan una sola vez por combinación
+            # Internado de strings recurrentes: las mismas herramientas y
+            # tipos de página se repiten en miles de patrones; compartir el
+            # objeto hace la igualdad/hash comparación de punteros
+            tool_name = sys.intern(tool_name)
+            page_type = context_info.get('page_type', 'unknown')
+            if isinstance(page_type, str):
+                page_type = sys.intern(page_type)
+
+            error_signature, category, severity, solution, tips = self._classify(
+                type(error).__name__,
+                str(error),
+                tool_name,
+                page_type
+            )
+
+            current_time = now_iso()
             
             if error_signature in self.error_patterns:
                 # Error existente - actualizar frecuencia
                 pattern = self.error_patterns[error_signature]
                 pattern.frequency += 1
                 pattern.last_seen = current_time
-                logger.info(f"Error conocido actualizado: {error_signature} (frecuencia: {pattern.frequency})")
+                pattern.last_seen_ts = time.time()
+                self._cat_counts[pattern.category.value] += 1
+                self._sev_counts[pattern.severity.value] += 1
+                if pattern.tool_name:
+                    self._tool_freq[pattern.tool_name] += 1
+                if pattern.frequency == 2:
+                    self._freq_eq_1 -= 1
+                elif pattern.frequency == 4:
+                    self._freq_gt_3 += 1
+                logger.info("Error conocido actualizado: %s (frecuencia: %d)", error_signature, pattern.frequency)
             else:
                 # Nuevo error - crear patrón
+                error_message = str(error)
+                if len(error_message) < 200:
+                    error_message = sys.intern(error_message)
                 pattern = ErrorPattern(
                     error_id=error_signature,
                     category=category,
                     severity=severity,
-                    error_message=str(error),
+                    error_message=error_message,
                     original_error=type(error).__name__,
                     context_info=context_info,
                     solution=solution,
-                    prevention_tips=tips,
+                    prevention_tips=list(tips),
                     tool_name=tool_name,
                     page_type=context_info.get('page_type'),
                     query_context=user_query
                 )
                 self.error_patterns[error_signature] = pattern
-                logger.info(f"Nuevo error capturado: {error_signature}")
-            
-            # Guardar cambios
-            self.save_errors()
+                self._index_pattern(pattern)
+                logger.info("Nuevo error capturado: %s", error_signature)
             
+            # Persistencia: una línea al changelog (O(1)) y compactación
+            # del snapshot por umbral o tiempo
+            self._append_log(pattern)
+            self._dirty += 1
+            if (self._dirty >= self._save_threshold
+                    or time.monotonic() - self._last_save > 5.0
+                    or self._log_lines > 2 * max(len(self.error_patterns), 50)):
+                self.flush()
+
             return error_signature
             
         except Exception as e:
-            logger.error(f"Error capturando error: {e}")
+            logger.error("Error capturando error: %s", e)
             return "unknown_error"
     
     def get_prevention_advice(
@@ -97,7 +339,7 @@ class CommonErrorManager:
         tool_name: str,
         context_info: Dict[str, Any],
         user_query: Optional[str] = None
-    ) -> List[ErrorRecommendation]:
+    ) -> List[Dict[str, Any]]:
         """
         Obtiene consejos de prevención basados en errores comunes
         
@@ -107,36 +349,58 @@ class CommonErrorManager:
             user_query: Query del usuario
         
         Returns:
-            Lista de recomendaciones de prevención
+            Lista de recomendaciones de prevención (dicts listos para la
+            respuesta MCP, sin conversión posterior)
         """
+        self._ensure_loaded()
+        # Herramienta sin historial: nada que recomendar, salir sin tocar
+        # heap ni cache de recomendaciones
+        if tool_name not in self._by_tool:
+            return []
+
         recommendations = []
-        
-        # Filtrar errores relevantes por herramienta
+
+        # Filtrar errores relevantes vía el índice por herramienta (O(k))
         relevant_errors = [
-            pattern for pattern in self.error_patterns.values()
-            if pattern.tool_name == tool_name and pattern.frequency > 1
+            pattern for pattern in self._by_tool.get(tool_name, ())
+            if pattern.frequency > 1
         ]
-        
-        # Ordenar por frecuencia y severidad
-        relevant_errors.sort(key=lambda x: (x.frequency, x.severity.value), reverse=True)
-        
-        # Generar recomendaciones basadas en los errores más comunes
-        for i, error_pattern in enumerate(relevant_errors[:5]):  # Top 5
-            recommendation = ErrorRecommendation(
-                recommendation_id=f"rec_{error_pattern.error_id}",
-                title=f"Evitar: {error_pattern.error_message}",
-                description=f"Este error ha ocurrido {error_pattern.frequency} veces. {error_pattern.solution or 'Revisar el contexto antes de proceder.'}",
-                related_errors=[error_pattern.error_id],
-                prevention_steps=error_pattern.prevention_tips,
-                applicable_contexts=[error_pattern.page_type or "cualquier página"],
-                priority=5 - i  # Mayor prioridad para errores más frecuentes
-            )
-            recommendations.append(recommendation)
+
+        # Top 5 por frecuencia y severidad sin ordenar la lista completa
+        top_errors = heapq.nlargest(
+            5, relevant_errors, key=lambda x: (x.frequency, x.severity.value)
+        )
+
+        # Generar recomendaciones basadas en los errores más comunes. La
+        # frecuencia hace de versión del patrón: mientras no cambie, la
+        # recomendación cacheada sigue siendo válida y solo se ajusta la
+        # prioridad (que depende del puesto en el ranking)
+        rec_cache = self._rec_cache
+        for i, error_pattern in enumerate(top_errors):
+            cached = rec_cache.get(error_pattern.error_id)
+            if cached is not None and cached[0] == error_pattern.frequency:
+                base = cached[1]
+            else:
+                base = {
+                    'recommendation_id': f"rec_{error_pattern.error_id}",
+                    'title': f"Evitar: {error_pattern.error_message}",
+                    'description': f"Este error ha ocurrido {error_pattern.frequency} veces. {error_pattern.solution or 'Revisar el contexto antes de proceder.'}",
+                    'related_errors': [error_pattern.error_id],
+                    'prevention_steps': error_pattern.prevention_tips,
+                    'applicable_contexts': [error_pattern.page_type or "cualquier página"],
+                }
+                rec_cache[error_pattern.error_id] = (error_pattern.frequency, base)
+            # Copia superficial con la prioridad del puesto actual: el dict
+            # cacheado ya fue devuelto a llamadores anteriores (y puede vivir
+            # en el caché TTL del servidor); mutarlo in situ reescribiría la
+            # prioridad dentro de esas respuestas ya entregadas
+            recommendations.append({**base, 'priority': 5 - i})
         
         return recommendations
     
     def get_error_statistics(self) -> ErrorStatistics:
         """Obtiene estadísticas de errores comunes"""
+        self._ensure_loaded()
         if not self.error_patterns:
             return ErrorStatistics(
                 total_errors=0,
@@ -148,21 +412,14 @@ class CommonErrorManager:
             )
         
         patterns = list(self.error_patterns.values())
+
+        # Contadores mantenidos incrementalmente en la captura: consultar
+        # estadísticas ya no re-escanea el catálogo dos veces
+        errors_by_category = dict(self._cat_counts)
+        errors_by_severity = dict(self._sev_counts)
         
-        # Estadísticas por categoría
-        errors_by_category = {}
-        for pattern in patterns:
-            category = pattern.category.value
-            errors_by_category[category] = errors_by_category.get(category, 0) + pattern.frequency
-        
-        # Estadísticas por severidad
-        errors_by_severity = {}
-        for pattern in patterns:
-            severity = pattern.severity.value
-            errors_by_severity[severity] = errors_by_severity.get(severity, 0) + pattern.frequency
-        
-        # Errores más comunes
-        most_common = sorted(patterns, key=lambda x: x.frequency, reverse=True)[:10]
+        # Errores más comunes: top-K con heap, O(N log 10) en vez de ordenar todo
+        most_common = heapq.nlargest(10, patterns, key=lambda x: x.frequency)
         most_common_errors = [
             {
                 'error_id': p.error_id,
@@ -174,9 +431,10 @@ class CommonErrorManager:
             for p in most_common
         ]
         
-        # Errores recientes (últimos 7 días)
-        week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        recent = [p for p in patterns if p.last_seen >= week_ago]
+        # Errores recientes (últimos 7 días): comparación numérica, sin
+        # parsear ni comparar strings ISO por patrón
+        week_ago_ts = time.time() - 7 * 86400
+        recent = [p for p in patterns if p.last_seen_ts >= week_ago_ts]
         recent_errors = [
             {
                 'error_id': p.error_id,
@@ -184,7 +442,7 @@ class CommonErrorManager:
                 'last_seen': p.last_seen,
                 'tool': p.tool_name
             }
-            for p in sorted(recent, key=lambda x: x.last_seen, reverse=True)[:10]
+            for p in heapq.nlargest(10, recent, key=lambda x: x.last_seen_ts)
         ]
         
         # Sugerencias de aprendizaje
@@ -199,64 +457,74 @@ class CommonErrorManager:
             learning_suggestions=learning_suggestions
         )
     
+    @lru_cache(maxsize=1024)
+    def _classify(
+        self,
+        err_type: str,
+        message: str,
+        tool_name: str,
+        page_type: Any
+    ) -> tuple:
+        """
+        Deriva (firma, categoría, severidad, solución, consejos) de un error.
+
+        Memoizado: errores idénticos (el camino caliente cuando la frecuencia
+        incrementa) no repiten hashing, lowercase ni escaneos de palabras.
+        Los consejos se devuelven como tupla inmutable compartible.
+        """
+        signature_data = f"{err_type}:{message[:100]}:{tool_name}:{page_type}"
+        signature = _fingerprint(signature_data.encode()).hexdigest()[:12]
+        # El mensaje se pasa ya en minúsculas: los tres clasificadores
+        # trabajaban sobre la misma string y cada uno la re-alocaba
+        err_lower = message.lower()
+        category = self._categorize_error(err_lower, tool_name)
+        # Conjunto de señales en un solo escaneo: severidad y consejos dejan
+        # de sondear el mensaje substring por substring
+        signals = {m.lastgroup for m in _SIGNAL_RE.finditer(err_lower)}
+        severity = self._determine_severity(signals, category)
+        solution, tips = self._generate_solution_and_tips(signals, tool_name, category)
+        return signature, category, severity, solution, tuple(tips)
+
     def _generate_error_signature(self, error: Exception, tool_name: str, context: Dict[str, Any]) -> str:
         """Genera un ID único para el error"""
         signature_data = f"{type(error).__name__}:{str(error)[:100]}:{tool_name}:{context.get('page_type', 'unknown')}"
-        return hashlib.md5(signature_data.encode()).hexdigest()[:12]
+        return _fingerprint(signature_data.encode()).hexdigest()[:12]
     
-    def _categorize_error(self, error: Exception, tool_name: str) -> ErrorCategory:
-        """Categoriza automáticamente el error"""
-        error_str = str(error).lower()
-        error_type = type(error).__name__.lower()
-        
-        # Patrones de categorización
-        if any(word in error_str for word in ['navigate', 'navegar', 'url', 'página']):
-            return ErrorCategory.NAVIGATION
-        elif any(word in error_str for word in ['selector', 'query_selector', 'elemento']):
-            return ErrorCategory.SELECTOR
-        elif any(word in error_str for word in ['extract', 'extracción', 'datos']):
-            return ErrorCategory.EXTRACTION
-        elif any(word in error_str for word in ['search', 'búsqueda', 'buscar']):
-            return ErrorCategory.SEARCH
-        elif any(word in error_str for word in ['pagination', 'paginación', 'siguiente', 'anterior']):
-            return ErrorCategory.PAGINATION
-        elif any(word in error_str for word in ['browser', 'playwright', 'chromium']):
-            return ErrorCategory.BROWSER
-        else:
-            return ErrorCategory.UNKNOWN
+    def _categorize_error(self, error_str: str, tool_name: str) -> ErrorCategory:
+        """Categoriza el error (espera el mensaje ya en minúsculas)"""
+        match = _CATEGORY_RE.search(error_str)
+        return ErrorCategory[match.lastgroup] if match else ErrorCategory.UNKNOWN
     
-    def _determine_severity(self, error: Exception, category: ErrorCategory) -> ErrorSeverity:
-        """Determina la severidad del error"""
-        error_str = str(error).lower()
-        
+    def _determine_severity(self, signals: set, category: ErrorCategory) -> ErrorSeverity:
+        """Determina la severidad a partir de las señales de _SIGNAL_RE"""
+
         # Errores críticos
-        if any(word in error_str for word in ['crash', 'fatal', 'browser closed']):
+        if 'CRITICAL' in signals:
             return ErrorSeverity.CRITICAL
-        
+
         # Errores altos
-        if any(word in error_str for word in ['timeout', 'connection', 'network']):
+        if 'TIMEOUT' in signals or 'NETWORK' in signals:
             return ErrorSeverity.HIGH
-        
+
         # Errores de navegación son generalmente importantes
         if category == ErrorCategory.NAVIGATION:
             return ErrorSeverity.HIGH
-        
+
         # Errores de selectores pueden ser medios o bajos
         if category == ErrorCategory.SELECTOR:
-            if 'not found' in error_str or 'no encontr' in error_str:
+            if 'NOTFOUND' in signals:
                 return ErrorSeverity.MEDIUM
             return ErrorSeverity.LOW
-        
+
         return ErrorSeverity.MEDIUM
     
     def _generate_solution_and_tips(
-        self, 
-        error: Exception, 
-        tool_name: str, 
+        self,
+        signals: set,
+        tool_name: str,
         category: ErrorCategory
     ) -> tuple[Optional[str], List[str]]:
-        """Genera solución y consejos de prevención"""
-        error_str = str(error).lower()
+        """Genera solución y consejos según las señales de _SIGNAL_RE"""
         
         # Soluciones específicas por tipo de error
         solutions = {
@@ -301,9 +569,9 @@ class CommonErrorManager:
         tips = tips_by_category.get(category, ["Revisar la documentación de la herramienta."])
         
         # Consejos específicos basados en el error
-        if 'timeout' in error_str:
+        if 'TIMEOUT' in signals:
             tips.append("Aumentar el timeout o verificar la conexión de red")
-        if 'not found' in error_str or 'no encontr' in error_str:
+        if 'NOTFOUND' in signals:
             tips.append("Verificar que el elemento exista en la página actual")
         
         return solution, tips
@@ -315,87 +583,169 @@ class CommonErrorManager:
         if not patterns:
             return ["Aún no hay suficientes datos para generar sugerencias."]
         
-        # Análisis de frecuencia
-        high_frequency_errors = [p for p in patterns if p.frequency >= 3]
-        if high_frequency_errors:
-            suggestions.append(f"Se han identificado {len(high_frequency_errors)} errores frecuentes. Considera revisar la lógica de estas operaciones.")
-        
-        # Análisis por categoría
-        category_counts = {}
+        # Una sola pasada AoS->SoA: frecuencia, categoría y timestamp pasan a
+        # columnas densas y los tres análisis operan sobre ellas sin volver a
+        # recorrer atributos de objetos
+        freqs = []
+        cats = []
+        seen_ts = []
         for pattern in patterns:
-            cat = pattern.category.value
-            category_counts[cat] = category_counts.get(cat, 0) + 1
-        
+            fields = pattern.__dict__
+            freqs.append(fields['frequency'])
+            cats.append(fields['category'].value)
+            seen_ts.append(fields['last_seen_ts'])
+
+        # Análisis de frecuencia
+        high_frequency = sum(1 for f in freqs if f >= 3)
+        if high_frequency:
+            suggestions.append(f"Se han identificado {high_frequency} errores frecuentes. Considera revisar la lógica de estas operaciones.")
+
+        # Análisis por categoría: Counter reduce la columna en C
+        category_counts = Counter(cats)
+
         if category_counts:
-            most_common_category = max(category_counts.keys(), key=lambda x: category_counts[x])
+            most_common_category = category_counts.most_common(1)[0][0]
             suggestions.append(f"La categoría más problemática es '{most_common_category}'. Considera mejorar el manejo en esta área.")
-        
+
         # Análisis temporal
-        recent_patterns = [p for p in patterns if p.last_seen >= (datetime.now() - timedelta(days=3)).isoformat()]
-        if len(recent_patterns) > len(patterns) * 0.5:
+        three_days_ago_ts = time.time() - 3 * 86400
+        recent_count = sum(1 for ts in seen_ts if ts >= three_days_ago_ts)
+        if recent_count > len(patterns) * 0.5:
             suggestions.append("Muchos errores son recientes. Puede haber cambios en el sitio web o en el código.")
         
         return suggestions
     
+    def flush(self):
+        """Vuelca a disco los cambios pendientes, si los hay"""
+        if self._dirty:
+            self.compact()
+            self._dirty = 0
+            self._last_save = time.monotonic()
+
+    def _ensure_loaded(self):
+        """Parsea el catálogo si aún no se ha hecho (carga diferida)"""
+        if not self._loaded:
+            self.load_errors()
+
     def load_errors(self):
-        """Carga errores desde el archivo JSON"""
+        """Carga el snapshot JSON y reproduce el changelog encima"""
+        self._loaded = True
         try:
+            data: Dict[str, Any] = {}
             if self.storage_path.exists():
-                with open(self.storage_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                for error_id, error_data in data.items():
-                    # Convertir strings de enum de vuelta a enums
-                    error_data['category'] = ErrorCategory(error_data['category'])
-                    error_data['severity'] = ErrorSeverity(error_data['severity'])
-                    
-                    self.error_patterns[error_id] = ErrorPattern(**error_data)
-                
-                logger.info(f"Cargados {len(self.error_patterns)} patrones de error desde {self.storage_path}")
+                with open(self.storage_path, 'rb') as f:
+                    data = _json_loads(f.read())
+
+            # Reproducir el changelog: entradas posteriores pisan anteriores
+            if self.log_path.exists():
+                with open(self.log_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            entry = _json_loads(line)
+                            data[entry['error_id']] = entry
+                            self._log_lines += 1
+                        except (ValueError, KeyError):
+                            # Línea truncada (p.ej. caída a mitad de append)
+                            continue
+
+            for error_id, error_data in data.items():
+                pattern = self._pattern_from_dict(error_data)
+                self.error_patterns[error_id] = pattern
+                self._index_pattern(pattern)
+
+            if self.error_patterns:
+                logger.info("Cargados %d patrones de error desde %s", len(self.error_patterns), self.storage_path)
         except Exception as e:
-            logger.error(f"Error cargando patrones de error: {e}")
+            logger.error("Error cargando patrones de error: %s", e)
             self.error_patterns = {}
+            self._by_tool = defaultdict(list)
+            self._cat_counts = defaultdict(int)
+            self._sev_counts = defaultdict(int)
+            self._token_index = defaultdict(set)
+            self._tool_freq = Counter()
+            self._freq_eq_1 = 0
+            self._freq_gt_3 = 0
     
     def save_errors(self):
         """Guarda errores en el archivo JSON"""
+        self._ensure_loaded()
         try:
             # Convertir a diccionario serializable
-            data = {}
+            # Empalmar fragmentos ya serializados: la mayoría de patrones no
+            # cambia entre guardados, así que solo se serializan los que no
+            # están en el cache (p.ej. recién cargados del snapshot)
+            cache = self._serial_cache
+            fragments = []
             for error_id, pattern in self.error_patterns.items():
-                pattern_dict = asdict(pattern)
-                # Convertir enums a strings
-                pattern_dict['category'] = pattern.category.value
-                pattern_dict['severity'] = pattern.severity.value
-                data[error_id] = pattern_dict
-            
-            with open(self.storage_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+                fragment = cache.get(error_id)
+                if fragment is None:
+                    fragment = _json_line(self._pattern_to_dict(pattern))
+                    cache[error_id] = fragment
+                fragments.append('%s:%s' % (_json_line(error_id), fragment))
+
+            # Escritura atómica: el snapshot se escribe completo en un
+            # temporal y os.replace lo publica de un golpe, de modo que un
+            # crash a mitad de escritura nunca corrompe el catálogo
+            tmp_path = self.storage_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(('{%s}' % ','.join(fragments)).encode('utf-8'))
+            os.replace(tmp_path, self.storage_path)
                 
-            logger.info(f"Guardados {len(self.error_patterns)} patrones de error en {self.storage_path}")
+            logger.info("Guardados %d patrones de error en %s", len(self.error_patterns), self.storage_path)
         except Exception as e:
-            logger.error(f"Error guardando patrones de error: {e}")
+            logger.error("Error guardando patrones de error: %s", e)
     
     def clear_old_errors(self, days: int = 30):
         """Limpia errores antiguos que no han vuelto a ocurrir"""
-        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
-        
+        self._ensure_loaded()
+        cutoff_ts = time.time() - days * 86400
+
         old_errors = [
             error_id for error_id, pattern in self.error_patterns.items()
-            if pattern.last_seen < cutoff_date and pattern.frequency == 1
+            if pattern.last_seen_ts < cutoff_ts and pattern.frequency == 1
         ]
         
         for error_id in old_errors:
-            del self.error_patterns[error_id]
-        
+            pattern = self.error_patterns.pop(error_id)
+            self._serial_cache.pop(error_id, None)
+            self._rec_cache.pop(error_id, None)
+            for token in self._pattern_tokens(pattern):
+                token_ids = self._token_index.get(token)
+                if token_ids:
+                    token_ids.discard(error_id)
+            if pattern.tool_name and pattern.tool_name in self._by_tool:
+                try:
+                    self._by_tool[pattern.tool_name].remove(pattern)
+                except ValueError:
+                    pass
+            self._cat_counts[pattern.category.value] -= pattern.frequency
+            self._sev_counts[pattern.severity.value] -= pattern.frequency
+            if pattern.tool_name:
+                self._tool_freq[pattern.tool_name] -= pattern.frequency
+            self._freq_eq_1 -= 1  # solo se limpian patrones con frecuencia 1
+
         if old_errors:
             self.save_errors()
-            logger.info(f"Limpiados {len(old_errors)} errores antiguos")
+            logger.info("Limpiados %d errores antiguos", len(old_errors))
     
-    def export_learning_data(self) -> Dict[str, Any]:
-        """Exporta datos de aprendizaje para análisis externo"""
-        return {
+    def export_learning_data(self, format_type: str = "full") -> Dict[str, Any]:
+        """Exporta datos de aprendizaje para análisis externo
+
+        Con format_type="summary" se omite la serialización del array de
+        patrones (lo más caro de la exportación), que el resumen descarta.
+        """
+        self._ensure_loaded()
+        data = {
             'total_patterns': len(self.error_patterns),
-            'patterns': [asdict(pattern) for pattern in self.error_patterns.values()],
             'statistics': asdict(self.get_error_statistics()),
             'export_timestamp': datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+        if format_type != "summary":
+            data['patterns'] = [
+                self._pattern_to_dict(pattern)
+                for pattern in self.error_patterns.values()
+            ]
+        return data
\ No newline at end of file
@@ -3,15 +3,26 @@
 Herramientas MCP para gestión de errores comunes
 """
 
+import asyncio
+import heapq
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from fastmcp import Context
 from fastmcp.exceptions import ToolError
-from dataclasses import asdict
 
-from models.errors import ErrorRecommendation
+from models.errors import now_iso
 from tools.error_manager import CommonErrorManager
 
+from functools import lru_cache
+
+
+@lru_cache(maxsize=256)
+def _tokenize_query(query: str) -> frozenset:
+    """Tokens en minúsculas de una consulta (memoizado: los agentes suelen
+    reintentar la misma búsqueda varias veces seguidas)"""
+    return frozenset(query.lower().split())
+
 
 class ErrorLearningTools:
     """Herramientas para aprendizaje y consulta de errores comunes"""
@@ -52,16 +63,23 @@ class ErrorLearningTools:
             result = {
                 'tool_name': tool_name,
                 'total_recommendations': len(recommendations),
-                'recommendations': [asdict(rec) for rec in recommendations],
+                'recommendations': recommendations,  # el gestor ya entrega dicts
                 'context_analyzed': context_info,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }
             
             if recommendations:
                 if ctx:
-                    await ctx.info(f"Se encontraron {len(recommendations)} recomendaciones de prevención")
-                    for i, rec in enumerate(recommendations[:3], 1):  # Mostrar top 3
-                        await ctx.warning(f"⚠️ Consejo {i}: {rec.title}")
+                    # Un solo round-trip por nivel: los consejos viajan en un
+                    # mensaje multilínea y ambos niveles salen en paralelo
+                    warnings = "\n".join(
+                        f"⚠️ Consejo {i}: {rec['title']}"
+                        for i, rec in enumerate(recommendations[:3], 1)  # Mostrar top 3
+                    )
+                    await asyncio.gather(
+                        ctx.info(f"Se encontraron {len(recommendations)} recomendaciones de prevención"),
+                        ctx.warning(warnings)
+                    )
             else:
                 if ctx:
                     await ctx.info("No se encontraron errores comunes para esta herramienta")
@@ -88,16 +106,24 @@ class ErrorLearningTools:
         
         try:
             stats = self.error_manager.get_error_statistics()
-            result = asdict(stats)
+            # Empaquetado manual: asdict() deep-copiaría cada dict y string
+            # anidado de unas estadísticas que el llamador nunca muta
+            result = {
+                'total_errors': stats.total_errors,
+                'errors_by_category': stats.errors_by_category,
+                'errors_by_severity': stats.errors_by_severity,
+                'most_common_errors': stats.most_common_errors,
+                'recent_errors': stats.recent_errors,
+                'learning_suggestions': stats.learning_suggestions,
+            }
             
             if ctx:
-                await ctx.info(f"📊 Total de errores únicos: {stats.total_errors}")
+                # Mensaje único multilínea en vez de un await por línea
+                lines = [f"📊 Total de errores únicos: {stats.total_errors}"]
                 if stats.most_common_errors:
-                    await ctx.info(f"🔥 Error más común: {stats.most_common_errors[0]['message']} ({stats.most_common_errors[0]['frequency']} veces)")
-                
-                # Mostrar sugerencias de aprendizaje
-                for suggestion in stats.learning_suggestions[:3]:
-                    await ctx.info(f"💡 {suggestion}")
+                    lines.append(f"🔥 Error más común: {stats.most_common_errors[0]['message']} ({stats.most_common_errors[0]['frequency']} veces)")
+                lines.extend(f"💡 {suggestion}" for suggestion in stats.learning_suggestions[:3])
+                await ctx.info("\n".join(lines))
             
             return result
             
@@ -129,18 +155,23 @@ class ErrorLearningTools:
             await ctx.info(f"Buscando errores similares a: '{error_description[:50]}...'")
         
         try:
-            search_terms = error_description.lower().split()
+            search_terms = _tokenize_query(error_description)
             similar_errors = []
-            
-            for pattern in self.error_manager.error_patterns.values():
+
+            # Candidatos vía el índice invertido del gestor: solo se puntúan
+            # los patrones que comparten al menos un término con la consulta,
+            # en vez de escanear y re-minusculizar el catálogo completo
+            match_counts = self.error_manager.match_counts(search_terms)
+            error_patterns = self.error_manager.error_patterns
+
+            for error_id, matches in match_counts.items():
+                pattern = error_patterns[error_id]
                 if tool_name and pattern.tool_name != tool_name:
                     continue
-                
+
                 # Calcular similitud básica
-                pattern_text = f"{pattern.error_message} {pattern.original_error}".lower()
-                matches = sum(1 for term in search_terms if term in pattern_text)
                 similarity = matches / len(search_terms) if search_terms else 0
-                
+
                 if similarity > 0.3:  # Umbral de similitud
                     similar_errors.append({
                         'error_id': pattern.error_id,
@@ -155,25 +186,31 @@ class ErrorLearningTools:
                         'last_seen': pattern.last_seen
                     })
             
-            # Ordenar por similitud y frecuencia
-            similar_errors.sort(key=lambda x: (x['similarity_score'], x['frequency']), reverse=True)
-            similar_errors = similar_errors[:limit]
+            # Top-limit por similitud y frecuencia con selección parcial,
+            # sin ordenar todos los candidatos
+            similar_errors = heapq.nlargest(
+                limit, similar_errors,
+                key=lambda x: (x['similarity_score'], x['frequency'])
+            )
             
             result = {
                 'search_query': error_description,
                 'tool_filter': tool_name,
                 'total_found': len(similar_errors),
                 'similar_errors': similar_errors,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }
             
             if ctx:
                 if similar_errors:
-                    await ctx.info(f"Se encontraron {len(similar_errors)} errores similares")
                     best_match = similar_errors[0]
-                    await ctx.info(f"🎯 Mejor coincidencia: {best_match['error_message']}")
+                    lines = [
+                        f"Se encontraron {len(similar_errors)} errores similares",
+                        f"🎯 Mejor coincidencia: {best_match['error_message']}"
+                    ]
                     if best_match['solution']:
-                        await ctx.info(f"💡 Solución sugerida: {best_match['solution']}")
+                        lines.append(f"💡 Solución sugerida: {best_match['solution']}")
+                    await ctx.info("\n".join(lines))
                 else:
                     await ctx.info("No se encontraron errores similares en el historial")
             
@@ -201,29 +238,29 @@ class ErrorLearningTools:
             stats = self.error_manager.get_error_statistics()
             patterns = list(self.error_manager.error_patterns.values())
             
-            # Análisis de patrones temporales
-            recent_errors = [p for p in patterns if 
-                           (datetime.now() - datetime.fromisoformat(p.last_seen.replace('Z', '+00:00').replace('+00:00', ''))).days <= 7]
-            
-            # Análisis de herramientas problemáticas
-            tool_errors = {}
-            for pattern in patterns:
-                if pattern.tool_name:
-                    tool_errors[pattern.tool_name] = tool_errors.get(pattern.tool_name, 0) + pattern.frequency
-            
-            # Top herramientas con más errores
-            problematic_tools = sorted(tool_errors.items(), key=lambda x: x[1], reverse=True)[:5]
+            # Análisis de patrones temporales: comparación de epochs, sin
+            # parsear el ISO de cada patrón en cada llamada
+            cutoff_ts = time.time() - 7 * 86400
+            recent_errors = [p for p in patterns if p.last_seen_ts >= cutoff_ts]
             
-            # Análisis de evolución (errores que han mejorado vs empeorado)
-            stable_errors = [p for p in patterns if p.frequency == 1]
-            recurring_errors = [p for p in patterns if p.frequency > 3]
+            # Análisis de herramientas problemáticas y de evolución: los
+            # agregados se mantienen incrementalmente en el gestor, así que
+            # aquí solo se consultan
+            tool_errors = self.error_manager.tool_error_frequencies
+
+            # Top herramientas con más errores: most_common usa un heap en C,
+            # sin ordenar el Counter completo
+            problematic_tools = tool_errors.most_common(5)
+
+            stable_count = self.error_manager.stable_error_count
+            recurring_count = self.error_manager.recurring_error_count
             
             insights = {
                 'summary': {
                     'total_unique_errors': len(patterns),
                     'recent_errors_count': len(recent_errors),
-                    'stable_errors': len(stable_errors),
-                    'recurring_errors': len(recurring_errors)
+                    'stable_errors': stable_count,
+                    'recurring_errors': recurring_count
                 },
                 'problematic_tools': [
                     {'tool_name': tool, 'error_frequency': freq} 
@@ -238,20 +275,26 @@ class ErrorLearningTools:
                     "Crear documentación específica para errores frecuentes"
                 ],
                 'success_indicators': [
-                    f"{len(stable_errors)} errores han ocurrido solo una vez (buena resolución)",
-                    f"{len(patterns) - len(recurring_errors)} errores no son recurrentes"
+                    f"{stable_count} errores han ocurrido solo una vez (buena resolución)",
+                    f"{len(patterns) - recurring_count} errores no son recurrentes"
                 ],
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }
             
             if ctx:
-                await ctx.info(f"📈 Análisis completado: {len(patterns)} patrones analizados")
-                await ctx.info(f"🔴 Errores recurrentes: {len(recurring_errors)}")
-                await ctx.info(f"🟢 Errores estables: {len(stable_errors)}")
-                
+                summary_msg = ctx.info(
+                    f"📈 Análisis completado: {len(patterns)} patrones analizados\n"
+                    f"🔴 Errores recurrentes: {recurring_count}\n"
+                    f"🟢 Errores estables: {stable_count}"
+                )
                 if problematic_tools:
                     tool_name, freq = problematic_tools[0]
-                    await ctx.warning(f"⚠️ Herramienta más problemática: {tool_name} ({freq} errores)")
+                    await asyncio.gather(
+                        summary_msg,
+                        ctx.warning(f"⚠️ Herramienta más problemática: {tool_name} ({freq} errores)")
+                    )
+                else:
+                    await summary_msg
             
             return insights
             
@@ -281,8 +324,10 @@ class ErrorLearningTools:
             await ctx.info(f"Exportando datos de errores en formato {format_type}")
         
         try:
-            export_data = self.error_manager.export_learning_data()
-            
+            # El formato se empuja al gestor: el resumen no necesita que se
+            # serialicen todos los patrones
+            export_data = self.error_manager.export_learning_data(format_type=format_type)
+
             if format_type == "summary":
                 # Versión resumida para el modelo
                 summary = {
@@ -308,27 +353,32 @@ class ErrorLearningTools:
             raise ToolError(f"Error exportando datos de errores: {str(e)}")
     
     def _generate_prevention_guidelines(self) -> Dict[str, List[str]]:
-        """Genera guías de prevención generales"""
-        return {
-            'before_navigation': [
-                "Verificar que la URL sea de MercadoLibre México",
-                "Comprobar la conectividad de red",
-                "Asegurar que el navegador esté inicializado"
-            ],
-            'before_extraction': [
-                "Confirmar que la página está completamente cargada",
-                "Verificar que hay elementos para extraer",
-                "Usar selectores validados previamente"
-            ],
-            'before_search': [
-                "Estar en la página principal de MercadoLibre",
-                "Usar términos de búsqueda claros",
-                "Verificar que la caja de búsqueda sea accesible"
-            ],
-            'general_best_practices': [
-                "Usar timeouts apropiados",
-                "Manejar errores graciosamente",
-                "Validar el contexto antes de cada operación",
-                "Reportar progreso en operaciones largas"
-            ]
-        }
\ No newline at end of file
+        """Guías de prevención generales (constante de módulo compartida)"""
+        return _PREVENTION_GUIDELINES
+
+
+# Guías estáticas: el mismo contenido en cada exportación, así que se
+# construye una sola vez y se sirve como referencia de solo lectura
+_PREVENTION_GUIDELINES: Dict[str, List[str]] = {
+    'before_navigation': [
+        "Verificar que la URL sea de MercadoLibre México",
+        "Comprobar la conectividad de red",
+        "Asegurar que el navegador esté inicializado"
+    ],
+    'before_extraction': [
+        "Confirmar que la página está completamente cargada",
+        "Verificar que hay elementos para extraer",
+        "Usar selectores validados previamente"
+    ],
+    'before_search': [
+        "Estar en la página principal de MercadoLibre",
+        "Usar términos de búsqueda claros",
+        "Verificar que la caja de búsqueda sea accesible"
+    ],
+    'general_best_practices': [
+        "Usar timeouts apropiados",
+        "Manejar errores graciosamente",
+        "Validar el contexto antes de cada operación",
+        "Reportar progreso en operaciones largas"
+    ]
+}
\ No newline at end of file
@@ -3,8 +3,11 @@
 Decorador y wrapper para captura automática de errores
 """
 
+import asyncio
 import functools
 import logging
+import re
+from functools import lru_cache
 from typing import Callable, Any, Dict, Optional
 from fastmcp import Context
 
@@ -14,6 +17,26 @@ from tools.error_manager import CommonErrorManager
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=512)
+def _message_tokens(message: str) -> frozenset:
+    """Tokens en minúsculas de un mensaje de error (memoizado: los mensajes
+    de los patrones se comparan contra cada error nuevo una y otra vez)"""
+    return frozenset(message.lower().split())
+
+
+# Señales de sugerencia inmediata en una sola pasada multi-patrón, como
+# hace el gestor con _SIGNAL_RE, en vez de un substring y un lower() por
+# keyword
+_SUGGESTION_RE = re.compile(r'(?P<TIMEOUT>timeout)|(?P<NOTFOUND>not found|no encontr)')
+
+
+@lru_cache(maxsize=256)
+def _probe_tokens(message: str) -> frozenset:
+    """Primeras tres palabras de un error, memoizadas: el mismo error suele
+    analizarse repetidamente en reintentos"""
+    return frozenset(message.lower().split()[:3])
+
+
 class ErrorCaptureMixin:
     """Mixin para captura automática de errores en herramientas"""
     
@@ -34,19 +57,17 @@ class ErrorCaptureMixin:
         def decorator(func: Callable) -> Callable:
             @functools.wraps(func)
             async def wrapper(*args, **kwargs):
-                ctx = None
                 user_query = None
                 context_info = {}
-                
-                # Extraer contexto y información de los argumentos
-                for arg in args:
-                    if isinstance(arg, Context):
-                        ctx = arg
-                        break
-                
-                # Buscar contexto en kwargs
-                if not ctx and 'ctx' in kwargs:
-                    ctx = kwargs['ctx']
+
+                # En FastMCP el contexto llega por convención como kwarg:
+                # tomar ese camino directo y escanear args solo si falla
+                ctx = kwargs.get('ctx')
+                if ctx is None:
+                    for arg in args:
+                        if type(arg) is Context or isinstance(arg, Context):
+                            ctx = arg
+                            break
                 
                 # Extraer query del usuario si está disponible
                 if 'query' in kwargs:
@@ -54,23 +75,32 @@ class ErrorCaptureMixin:
                 elif 'user_query' in kwargs:
                     user_query = kwargs['user_query']
                 
-                # Obtener información del contexto actual
-                try:
-                    if hasattr(self, 'browser') and self.browser.page:
-                        page_info = await self.browser.get_page_info()
-                        context_info = {
-                            'page_url': page_info.url,
-                            'page_type': page_info.page_type,
-                            'page_title': page_info.title,
-                            'is_ml_mexico': page_info.is_ml_mexico
-                        }
-                except Exception:
-                    # Si no se puede obtener info de página, continuar
-                    pass
-                
+                async def _page_context() -> Dict[str, Any]:
+                    """Información de la página actual (vacío si no hay)"""
+                    try:
+                        if hasattr(self, 'browser') and self.browser.page:
+                            page_info = await self.browser.get_page_info()
+                            return {
+                                'page_url': page_info.url,
+                                'page_type': page_info.page_type,
+                                'page_title': page_info.title,
+                                'is_ml_mexico': page_info.is_ml_mexico
+                            }
+                    except Exception:
+                        # Si no se puede obtener info de página, continuar
+                        pass
+                    return {}
+
+                # El preflight (round-trip a Playwright incluido) solo se paga
+                # si hay a quién mostrar consejos y la herramienta tiene
+                # historial; en el camino limpio no cuesta nada
+                show_advice = ctx is not None and self.error_manager.has_errors_for(tool_name)
+                if show_advice:
+                    context_info = await _page_context()
+
                 try:
                     # Obtener consejos de prevención antes de ejecutar
-                    if ctx:
+                    if show_advice:
                         try:
                             recommendations = self.error_manager.get_prevention_advice(
                                 tool_name=tool_name,
@@ -82,9 +112,9 @@ class ErrorCaptureMixin:
                             if recommendations:
                                 await ctx.warning(f"⚠️ Se han detectado {len(recommendations)} errores comunes para '{tool_name}'")
                                 for rec in recommendations[:2]:  # Mostrar top 2
-                                    await ctx.info(f"💡 Consejo: {rec.description}")
+                                    await ctx.info(f"💡 Consejo: {rec['description']}")
                         except Exception as prevention_error:
-                            logger.debug(f"Error obteniendo consejos de prevención: {prevention_error}")
+                            logger.debug("Error obteniendo consejos de prevención: %s", prevention_error)
                     
                     # Ejecutar la función original
                     result = await func(*args, **kwargs)
@@ -96,8 +126,11 @@ class ErrorCaptureMixin:
                     return result
                     
                 except Exception as e:
-                    # Capturar el error para aprendizaje futuro
+                    # Capturar el error para aprendizaje futuro (recuperando
+                    # el contexto de página si el preflight se lo saltó)
                     try:
+                        if not context_info:
+                            context_info = await _page_context()
                         error_id = self.error_manager.capture_error(
                             error=e,
                             tool_name=tool_name,
@@ -109,10 +142,13 @@ class ErrorCaptureMixin:
                             await ctx.error(f"❌ Error capturado: {error_id}")
                             
                             # Buscar errores similares para sugerir soluciones
-                            similar_errors = []
-                            for pattern in list(self.error_manager.error_patterns.values())[:5]:
-                                if pattern.tool_name == tool_name and pattern.solution:
-                                    similar_errors.append(pattern)
+                            # usando el índice por herramienta, sin copiar el
+                            # catálogo completo a una lista
+                            similar_errors = [
+                                pattern
+                                for pattern in self.error_manager.get_patterns_for(tool_name)[:5]
+                                if pattern.solution
+                            ]
                             
                             if similar_errors:
                                 await ctx.info("🔍 Errores similares encontrados:")
@@ -123,7 +159,7 @@ class ErrorCaptureMixin:
                                             await ctx.info(f"   - {tip}")
                         
                     except Exception as capture_error:
-                        logger.error(f"Error capturando error: {capture_error}")
+                        logger.error("Error capturando error: %s", capture_error)
                     
                     # Re-lanzar el error original
                     raise e
@@ -146,20 +182,33 @@ def capture_tool_errors(tool_name: str, error_manager: Optional[CommonErrorManag
     """
     if error_manager is None:
         error_manager = CommonErrorManager()
-    
+
+    # Métodos ligados resueltos una vez al decorar: el wrapper corre en cada
+    # invocación MCP y se ahorra las búsquedas de atributo en caliente
+    get_advice = error_manager.get_prevention_advice
+    has_errors_for = error_manager.has_errors_for
+    capture = error_manager.capture_error
+
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            ctx = None
             user_query = None
             context_info = {}
-            
-            # Buscar contexto en los argumentos
-            for arg in list(args) + list(kwargs.values()):
-                if isinstance(arg, Context):
-                    ctx = arg
-                    break
-            
+
+            # Camino rápido: ctx llega como kwarg en las herramientas FastMCP;
+            # el escaneo (sin concatenar listas) queda solo como respaldo
+            ctx = kwargs.get('ctx')
+            if ctx is None:
+                for arg in args:
+                    if type(arg) is Context or isinstance(arg, Context):
+                        ctx = arg
+                        break
+                else:
+                    for arg in kwargs.values():
+                        if type(arg) is Context or isinstance(arg, Context):
+                            ctx = arg
+                            break
+
             # Extraer información relevante
             if 'query' in kwargs:
                 user_query = kwargs['query']
@@ -167,45 +216,49 @@ def capture_tool_errors(tool_name: str, error_manager: Optional[CommonErrorManag
                 user_query = kwargs['user_query']
             elif len(args) > 0 and isinstance(args[0], str):
                 user_query = args[0]  # Primer argumento string como query
-            
+
             try:
-                # Obtener consejos preventivos
-                if ctx:
+                # Obtener consejos preventivos (solo si la herramienta tiene
+                # historial: el chequeo O(1) evita el preflight en el caso
+                # común de herramientas limpias)
+                if ctx and has_errors_for(tool_name):
                     try:
-                        recommendations = error_manager.get_prevention_advice(
+                        recommendations = get_advice(
                             tool_name=tool_name,
                             context_info=context_info,
                             user_query=user_query
                         )
-                        
+
                         if recommendations:
                             await ctx.info(f"💡 {len(recommendations)} consejos de prevención disponibles para {tool_name}")
                     except Exception:
                         pass
-                
+
                 # Ejecutar función
                 result = await func(*args, **kwargs)
                 return result
-                
+
             except Exception as e:
-                # Capturar error
+                # Capturar error en un hilo: persiste a disco y bloquearía
+                # el loop durante el manejo del fallo
                 try:
-                    error_id = error_manager.capture_error(
+                    error_id = await asyncio.to_thread(
+                        capture,
                         error=e,
                         tool_name=tool_name,
                         context_info=context_info,
                         user_query=user_query
                     )
-                    
+
                     if ctx:
                         await ctx.error(f"Error registrado para aprendizaje: {error_id}")
-                        
+
                 except Exception as capture_error:
-                    logger.error(f"Error en captura: {capture_error}")
-                
+                    logger.error("Error en captura: %s", capture_error)
+
                 # Re-lanzar error original
                 raise e
-        
+
         return wrapper
     return decorator
 
@@ -242,14 +295,17 @@ class EnhancedErrorCapture:
             context_info=context_info
         )
         
-        # Buscar errores similares
+        # Buscar errores similares: el error nuevo se tokeniza una vez y la
+        # similitud es una intersección de sets hasheados, no un escaneo de
+        # substring por palabra y por patrón
         error_str = str(error)
+        probe = _probe_tokens(error_str)
         similar_errors = []
-        
+
         for pattern in self.error_manager.error_patterns.values():
-            if (pattern.tool_name == tool_name and 
+            if (pattern.tool_name == tool_name and
                 pattern.error_id != error_id and
-                any(word in pattern.error_message.lower() for word in error_str.lower().split()[:3])):
+                probe & _message_tokens(pattern.error_message)):
                 similar_errors.append(pattern)
         
         # Generar sugerencias
@@ -273,16 +329,18 @@ class EnhancedErrorCapture:
                         'based_on': 'Prevención de errores similares'
                     })
         
-        # Sugerencias generales basadas en el tipo de error
-        if 'timeout' in error_str.lower():
+        # Sugerencias generales basadas en el tipo de error: un solo lower()
+        # y un solo escaneo para todas las keywords
+        hits = {m.lastgroup for m in _SUGGESTION_RE.finditer(error_str.lower())}
+        if 'TIMEOUT' in hits:
             suggestions.append({
                 'type': 'immediate_action',
                 'text': 'Intentar aumentar el timeout o verificar la conexión',
                 'confidence': 0.9,
                 'based_on': 'Patrón de timeout detectado'
             })
-        
-        if 'not found' in error_str.lower() or 'no encontr' in error_str.lower():
+
+        if 'NOTFOUND' in hits:
             suggestions.append({
                 'type': 'immediate_action',
                 'text': 'Verificar que el elemento existe en la página actual',
@@ -301,9 +359,13 @@ class EnhancedErrorCapture:
         
         # Reportar al contexto si está disponible
         if ctx:
-            await ctx.info(f"🔍 Análisis del error {error_id[:8]}...")
+            # Mensaje único: tres awaits al transporte colapsan en uno
+            message = f"🔍 Análisis del error {error_id[:8]}..."
             if suggestions:
-                await ctx.info(f"💡 Sugerencia principal: {analysis['recommended_action']}")
-                await ctx.info(f"🎯 Confianza: {analysis['confidence_level']}")
+                message += (
+                    f"\n💡 Sugerencia principal: {analysis['recommended_action']}"
+                    f"\n🎯 Confianza: {analysis['confidence_level']}"
+                )
+            await ctx.info(message)
         
         return analysis
\ No newline at end of file
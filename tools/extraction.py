@@ -1,11 +1,17 @@
 
+import re
 from datetime import datetime
+from dataclasses import asdict
 from typing import Dict, Any, Optional
 from fastmcp import Context
 from fastmcp.exceptions import ToolError
 
 from browser.browser import MercadoLibreBrowser
 
+# Separador de tags del formateo de respaldo: operar sobre bytes evita el
+# escaneo de code points Unicode de str.replace en HTML mayormente ASCII
+_TAG_GAP_RE = re.compile(rb'><')
+
 
 class ExtractionTools:
     """Herramientas para extracción de HTML y contenido"""
@@ -42,22 +48,36 @@ class ExtractionTools:
             # Extraer HTML
             if selector:
                 try:
-                    element = await self.browser.page.query_selector(selector)
-                    if element:
-                        html_content = await element.inner_html()
-                        extraction_scope = f"elemento: {selector}"
-                    else:
-                        raise ToolError(f"No se encontró elemento con selector: {selector}")
+                    # Selección y truncado en un solo evaluate: inner_html()
+                    # transportaba el subárbol completo (que en raíces como
+                    # .ui-search-main pasa de 1 MB) antes de cortar en Python
+                    payload = await self.browser.page.evaluate(
+                        "(args) => { const e = document.querySelector(args.s);"
+                        " if (!e) return null; const h = e.innerHTML;"
+                        " return [h.length, h.slice(0, args.n)]; }",
+                        {'s': selector, 'n': max_length + 1024}
+                    )
                 except Exception as e:
                     raise ToolError(f"Error extrayendo elemento {selector}: {str(e)}")
+                if payload is None:
+                    raise ToolError(f"No se encontró elemento con selector: {selector}")
+                original_length, html_content = payload
+                extraction_scope = f"elemento: {selector}"
             else:
-                html_content = await self.browser.page.content()
+                # Truncar dentro del navegador: page.content() serializa y
+                # transporta el DOM completo por el WebSocket aunque el
+                # llamador pida unos pocos KB. El largo original viaja aparte
+                # para reportarlo sin traer el documento entero.
+                original_length, html_content = await self.browser.page.evaluate(
+                    "(n) => { const s = document.documentElement.outerHTML;"
+                    " return [s.length, s.slice(0, n)]; }",
+                    max_length + 1024
+                )
                 extraction_scope = "página completa"
-            
+
             # Procesar HTML
-            original_length = len(html_content)
             truncated = False
-            
+
             if len(html_content) > max_length:
                 html_content = html_content[:max_length]
                 truncated = True
@@ -65,12 +85,26 @@ class ExtractionTools:
             # Formatear si se solicita
             if pretty_format:
                 try:
-                    from bs4 import BeautifulSoup
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    html_content = soup.prettify()
+                    # selectolax (lexbor, parser C) normaliza y re-serializa
+                    # sin construir un árbol Python: mucho más barato que BS4
+                    from selectolax.lexbor import LexborHTMLParser
+                    html_content = LexborHTMLParser(html_content).html
                 except ImportError:
-                    # Si no está disponible BeautifulSoup, formato básico
-                    html_content = html_content.replace('><', '>\n<')
+                    try:
+                        from bs4 import BeautifulSoup, FeatureNotFound
+                        try:
+                            # lxml parsea 5-10x más rápido que html.parser en
+                            # páginas grandes de MercadoLibre
+                            soup = BeautifulSoup(html_content, 'lxml')
+                        except FeatureNotFound:
+                            soup = BeautifulSoup(html_content, 'html.parser')
+                        html_content = soup.prettify()
+                    except ImportError:
+                        # Si no está disponible BeautifulSoup, formato básico
+                        # por bytes
+                        html_content = _TAG_GAP_RE.sub(
+                            b'>\n<', html_content.encode('utf-8', 'replace')
+                        ).decode('utf-8', 'replace')
             
             page_info = await self.browser.get_page_info()
             
@@ -84,7 +118,7 @@ class ExtractionTools:
                     'pretty_formatted': pretty_format,
                     'timestamp': datetime.now().isoformat()
                 },
-                'page_info': page_info.__dict__,
+                'page_info': asdict(page_info),
                 'html_content': html_content,
                 'analysis_hints': {
                     'mercadolibre_patterns': [
@@ -138,41 +172,43 @@ class ExtractionTools:
             if not self.browser.page:
                 raise ToolError("No hay ninguna página cargada")
             
+            # El recorrido y la lectura de texto ocurren dentro del navegador:
+            # un eval_on_selector_all reemplaza los N+1 round-trips (query más
+            # un inner_text por elemento)
             if all_matches:
-                elements = await self.browser.page.query_selector_all(selector)
+                texts = await self.browser.page.eval_on_selector_all(
+                    selector,
+                    "(els) => els.map(e => (e.innerText || '').trim())"
+                )
             else:
-                element = await self.browser.page.query_selector(selector)
-                elements = [element] if element else []
-            
-            if not elements:
+                texts = await self.browser.page.eval_on_selector_all(
+                    selector,
+                    "(els) => els.slice(0, 1).map(e => (e.innerText || '').trim())"
+                )
+
+            if not texts:
                 raise ToolError(f"No se encontraron elementos con selector: {selector}")
-            
-            extracted_texts = []
-            for i, element in enumerate(elements):
-                try:
-                    text = await element.inner_text()
-                    extracted_texts.append({
-                        'index': i,
-                        'text': text.strip(),
-                        'length': len(text.strip())
-                    })
-                except Exception as e:
-                    extracted_texts.append({
-                        'index': i,
-                        'error': str(e)
-                    })
-            
+
+            extracted_texts = [
+                {
+                    'index': i,
+                    'text': text,
+                    'length': len(text)
+                }
+                for i, text in enumerate(texts)
+            ]
+
             result = {
                 'selector': selector,
                 'all_matches': all_matches,
-                'elements_found': len(elements),
-                'successful_extractions': len([t for t in extracted_texts if 'text' in t]),
+                'elements_found': len(texts),
+                'successful_extractions': len(extracted_texts),
                 'extracted_texts': extracted_texts,
                 'timestamp': datetime.now().isoformat()
             }
-            
+
             if ctx:
-                await ctx.info(f"Texto extraído de {result['successful_extractions']}/{len(elements)} elementos")
+                await ctx.info(f"Texto extraído de {result['successful_extractions']}/{len(texts)} elementos")
             
             return result
             
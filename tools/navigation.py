@@ -3,7 +3,9 @@
 Herramientas de navegación para MercadoLibre México
 """
 
+import re
 from datetime import datetime
+from dataclasses import asdict
 from typing import Dict, Any, Optional
 from fastmcp import Context
 from fastmcp.exceptions import ToolError
@@ -12,6 +14,11 @@ from fastmcp.exceptions import ToolError
 from browser.browser import MercadoLibreBrowser
 from models.product import NavigationResult
 
+# Una URL de resultados tiene path /search o un parámetro q=; un solo scan
+# compilado reemplaza los dos substring por búsqueda (y ancla q= al query
+# string para no confundirlo con fragmentos como 'faq=')
+_SEARCH_URL_RE = re.compile(r'/search|[?&]q=')
+
 
 class NavigationTools:
     """Herramientas para navegación en MercadoLibre"""
@@ -53,7 +60,7 @@ class NavigationTools:
             if ctx:
                 await ctx.info(f"Navegación exitosa a: {page_info.title or 'Página sin título'}")
             
-            return result.__dict__
+            return asdict(result)
             
         except Exception as e:
             if ctx:
@@ -107,7 +114,7 @@ class NavigationTools:
             
             # Verificar si llegamos a página de resultados
             current_url = self.browser.page.url
-            is_search_results = '/search' in current_url or 'q=' in current_url
+            is_search_results = _SEARCH_URL_RE.search(current_url) is not None
             
             result = {
                 'search_query': query,
@@ -150,7 +157,7 @@ class NavigationTools:
                 raise ToolError("No hay ninguna página cargada")
             
             page_info = await self.browser.get_page_info()
-            result = page_info.__dict__
+            result = asdict(page_info)
             
             if ctx:
                 await ctx.info(f"Página actual: {result.get('page_type', 'unknown')} - {result.get('title', 'Sin título')}")
@@ -5,9 +5,8 @@ Herramientas de extracción de productos para MercadoLibre México
 
 import re
 from datetime import datetime
-from dataclasses import asdict
+from dataclasses import fields
 from typing import Dict, Any, Optional, List
-from urllib.parse import urljoin
 from fastmcp import Context
 from fastmcp.exceptions import ToolError
 
@@ -15,11 +14,133 @@ from browser.browser import MercadoLibreBrowser
 from models.product import ProductData, PriceStatistics, ExtractionResult
 
 
+class _Interner:
+    """
+    Interner de strings acotado para campos repetitivos de producto.
+
+    En una página de resultados, seller/shipping toman un puñado de valores
+    ("Envío gratis", "MercadoLibre", ...) pero cada inner_text() crea un str
+    nuevo; dedupearlos reduce asignaciones y mejora la localidad al serializar.
+    """
+
+    __slots__ = ('cache', '_max')
+
+    def __init__(self, max_size: int = 4096):
+        self.cache: Dict[str, str] = {}
+        self._max = max_size
+
+    def __call__(self, s: Optional[str]) -> Optional[str]:
+        if s is None:
+            return None
+        cached = self.cache.get(s)
+        if cached is not None:
+            return cached
+        if len(self.cache) >= self._max:
+            # Evicción FIFO simple (los dicts conservan orden de inserción)
+            self.cache.pop(next(iter(self.cache)))
+        self.cache[s] = s
+        return s
+
+
+_intern = _Interner()
+
+# Compilado una vez: parsear precios corre por producto extraído y en cada
+# cálculo de estadísticas
+_PRICE_NUM_RE = re.compile(r'\d[\d.,]*')
+
+
+def _parse_price(text: Optional[str]) -> Optional[float]:
+    """
+    Primer número de un texto de precio ('$1,499.00' -> 1499.0) o None.
+
+    Un solo search reemplaza las dos reescrituras re.sub por producto y
+    evita el except desnudo que escondía precios malformados.
+    """
+    if not text:
+        return None
+    match = _PRICE_NUM_RE.search(text)
+    if not match:
+        return None
+    try:
+        return float(match.group().replace(',', ''))
+    except ValueError:
+        return None
+
+# Extractor de tarjetas ejecutado dentro del navegador: un solo round-trip
+# CDP trae todos los campos de todas las tarjetas, en lugar de ~7 RPCs por
+# producto (querySelector + inner_text/get_attribute por campo)
+_CARDS_EXTRACT_JS = """
+(opts) => {
+    const { rootSel, sels, limit } = opts;
+    const all = document.querySelectorAll(rootSel);
+    const text = (card, sel) => {
+        if (!sel) return null;
+        const el = card.querySelector(sel);
+        if (!el) return null;
+        const t = (el.innerText || '').trim();
+        return t || null;
+    };
+    const attr = (card, sel, name) => {
+        if (!sel) return null;
+        const el = card.querySelector(sel);
+        return el ? el.getAttribute(name) : null;
+    };
+    const absLink = (card, sel) => {
+        // new URL resuelve rutas relativas en nativo contra location.href:
+        // N urljoin de Python menos por página
+        if (!sel) return null;
+        const el = card.querySelector(sel);
+        if (!el) return null;
+        const href = el.getAttribute('href');
+        if (!href) return null;
+        try { return new URL(href, location.href).href; } catch (err) { return href; }
+    };
+    const imgSrc = (card, sel) => {
+        // Las imágenes lazy de ML llevan un placeholder 1x1 en src y la URL
+        // real en data-src/data-lazy: resolver aquí evita un segundo RPC
+        if (!sel) return null;
+        const el = card.querySelector(sel);
+        if (!el) return null;
+        return el.getAttribute('data-src')
+            || el.getAttribute('data-lazy')
+            || el.getAttribute('src');
+    };
+    return {
+        total: all.length,
+        cards: Array.from(all).slice(0, limit).map(card => ({
+            title: text(card, sels.title),
+            price: text(card, sels.price),
+            original_price: text(card, sels.original_price),
+            link: absLink(card, sels.link),
+            image: imgSrc(card, sels.image),
+            shipping: text(card, sels.shipping),
+            seller: text(card, sels.seller)
+        }))
+    };
+}
+"""
+
+# Campos que el extractor JS resuelve por tarjeta
+_CARD_FIELDS = ('title', 'price', 'original_price', 'link', 'image', 'shipping', 'seller')
+
+# Campos planos de ProductData, resueltos una vez: serializar por getattr
+# evita el deepcopy interno de dataclasses.asdict (no hay anidamiento que
+# justifique copiar en profundidad)
+_PRODUCT_FIELDS = tuple(f.name for f in fields(ProductData))
+
+
 class ProductTools:
     """Herramientas para extracción de datos de productos"""
     
     def __init__(self, browser: MercadoLibreBrowser):
         self.browser = browser
+        # Snapshot de los selectores por defecto resuelto una sola vez: el
+        # caso común (sin custom_selectors) se ahorra copiar y reindexar el
+        # dict de configuración en cada llamada
+        self._default_sels = {
+            field: browser.config.DEFAULT_SELECTORS.get(field)
+            for field in _CARD_FIELDS
+        }
     
     async def extract_products(
         self,
@@ -46,44 +167,56 @@ class ProductTools:
                 raise ToolError("No hay ninguna página cargada")
             
             # Usar selectores por defecto o personalizados
-            selectors = self.browser.config.DEFAULT_SELECTORS.copy()
+            selectors = self.browser.config.DEFAULT_SELECTORS
             if custom_selectors:
-                selectors.update(custom_selectors)
-            
-            # Encontrar tarjetas de productos
-            product_cards = await self.browser.page.query_selector_all(selectors['product_card'])
-            
-            if not product_cards:
+                selectors = {**selectors, **custom_selectors}
+                sels = {field: selectors.get(field) for field in _CARD_FIELDS}
+            else:
+                sels = self._default_sels
+
+            # Extraer todas las tarjetas en un solo page.evaluate: el paseo
+            # por el DOM ocurre dentro del navegador y viaja un único mensaje
+            raw = await self.browser.page.evaluate(_CARDS_EXTRACT_JS, {
+                'rootSel': selectors['product_card'],
+                'sels': sels,
+                'limit': limit
+            })
+
+            if not raw['total']:
                 raise ToolError("No se encontraron productos en la página")
-            
+
+            # Capturada una vez: la propiedad cruza a Playwright y no cambia
+            # durante la extracción
+            page_url = self.browser.page.url
+
             products = []
             extraction_errors = []
-            
-            for i, card in enumerate(product_cards[:limit]):
-                if ctx and i % 5 == 0:  # Reportar progreso cada 5 productos
-                    await ctx.report_progress(progress=i, total=min(len(product_cards), limit))
-                
+
+            for i, card_data in enumerate(raw['cards']):
                 try:
-                    product = await self._extract_single_product(card, selectors)
+                    product = self._build_product(card_data)
                     if product.title:  # Solo agregar si tiene título
-                        products.append(asdict(product))
-                    
+                        products.append({
+                            name: getattr(product, name)
+                            for name in _PRODUCT_FIELDS
+                        })
+
                 except Exception as e:
                     extraction_errors.append({
                         'product_index': i,
                         'error': str(e)
                     })
-            
+
             # Estadísticas de precios
             price_stats = self._calculate_price_stats(products)
-            
+
             result = {
                 'extraction_info': {
-                    'products_found': len(product_cards),
+                    'products_found': raw['total'],
                     'products_extracted': len(products),
                     'extraction_errors': len(extraction_errors),
                     'selectors_used': selectors,
-                    'page_url': self.browser.page.url,
+                    'page_url': page_url,
                     'timestamp': datetime.now().isoformat()
                 },
                 'price_statistics': price_stats.__dict__ if price_stats else None,
@@ -92,7 +225,7 @@ class ProductTools:
             }
             
             if ctx:
-                await ctx.info(f"Extracción completada: {len(products)} productos de {len(product_cards)}")
+                await ctx.info(f"Extracción completada: {len(products)} productos de {raw['total']}")
                 await ctx.report_progress(progress=limit, total=limit)
             
             return result
@@ -102,69 +235,36 @@ class ProductTools:
                 await ctx.error(f"Error extrayendo productos: {str(e)}")
             raise ToolError(f"Error extrayendo productos: {str(e)}")
     
-    async def _extract_single_product(self, card, selectors: Dict[str, str]) -> ProductData:
-        """Extrae datos de un solo producto"""
-        
-        async def safe_extract_text(parent, selector_key):
-            """Extrae texto de manera segura"""
-            if selector_key not in selectors:
-                return None
-            try:
-                element = await parent.query_selector(selectors[selector_key])
-                if element:
-                    text = await element.inner_text()
-                    return text.strip() if text else None
-            except:
-                pass
-            return None
-        
-        async def safe_extract_attribute(parent, selector_key, attribute):
-            """Extrae atributo de manera segura"""
-            if selector_key not in selectors:
-                return None
-            try:
-                element = await parent.query_selector(selectors[selector_key])
-                if element:
-                    return await element.get_attribute(attribute)
-            except:
-                pass
-            return None
-        
-        # Extraer datos básicos
-        title = await safe_extract_text(card, 'title')
-        if not title:
-            title = "Producto sin título"
-        
-        price = await safe_extract_text(card, 'price')
+    def _build_product(self, card_data: Dict[str, Any]) -> ProductData:
+        """Construye un ProductData desde los campos crudos del extractor JS"""
+
+        title = card_data.get('title') or "Producto sin título"
+
+        price = card_data.get('price')
         if price and not price.startswith('$'):
             price = f"${price}"
-        
-        original_price = await safe_extract_text(card, 'original_price')
-        
+
+        original_price = card_data.get('original_price')
+
         # Calcular descuento
         discount = None
         if original_price and price:
-            try:
-                orig_num = float(re.sub(r'[^\d.]', '', original_price))
-                curr_num = float(re.sub(r'[^\d.]', '', price))
-                if orig_num > curr_num:
-                    discount_pct = ((orig_num - curr_num) / orig_num) * 100
-                    discount = f"{discount_pct:.0f}% OFF"
-            except:
-                pass
-        
-        # URL del producto
-        product_url = await safe_extract_attribute(card, 'link', 'href')
-        if product_url and product_url.startswith('/'):
-            product_url = urljoin(self.browser.config.BASE_URL, product_url)
-        
+            orig_num = _parse_price(original_price)
+            curr_num = _parse_price(price)
+            if orig_num and curr_num and orig_num > curr_num:
+                discount_pct = ((orig_num - curr_num) / orig_num) * 100
+                discount = f"{discount_pct:.0f}% OFF"
+
+        # URL del producto (el extractor ya la entrega absoluta)
+        product_url = card_data.get('link')
+
         # URL de imagen
-        image_url = await safe_extract_attribute(card, 'image', 'src')
-        
-        # Otros datos
-        shipping = await safe_extract_text(card, 'shipping')
-        seller = await safe_extract_text(card, 'seller')
-        
+        image_url = card_data.get('image')
+
+        # Otros datos (internados: pocos valores únicos por página)
+        shipping = _intern(card_data.get('shipping'))
+        seller = _intern(card_data.get('seller'))
+
         return ProductData(
             title=title,
             price=price,
@@ -177,23 +277,36 @@ class ProductTools:
         )
     
     def _calculate_price_stats(self, products: List[Dict]) -> Optional[PriceStatistics]:
-        """Calcula estadísticas de precios"""
-        prices = []
+        """Calcula estadísticas de precios en una sola pasada acumulada"""
+        count = 0
+        total = 0.0
+        min_price: Optional[float] = None
+        max_price: Optional[float] = None
+        discount_count = 0
+
+        # Suma, mínimo, máximo y descuentos se acumulan en el mismo loop:
+        # antes había una lista intermedia más cuatro recorridos separados
+        # (sum/min/max y la comprehension de descuentos)
         for product in products:
-            if product.get('price'):
-                try:
-                    price_num = float(re.sub(r'[^\d.]', '', product['price']))
-                    prices.append(price_num)
-                except:
-                    continue
-        
-        if not prices:
+            if product.get('discount'):
+                discount_count += 1
+            price_num = _parse_price(product.get('price'))
+            if price_num is None:
+                continue
+            count += 1
+            total += price_num
+            if min_price is None or price_num < min_price:
+                min_price = price_num
+            if max_price is None or price_num > max_price:
+                max_price = price_num
+
+        if not count:
             return None
-        
+
         return PriceStatistics(
-            total_products_with_price=len(prices),
-            average_price_mxn=round(sum(prices) / len(prices), 2),
-            min_price_mxn=min(prices),
-            max_price_mxn=max(prices),
-            products_with_discount=len([p for p in products if p.get('discount')])
+            total_products_with_price=count,
+            average_price_mxn=round(total / count, 2),
+            min_price_mxn=min_price,
+            max_price_mxn=max_price,
+            products_with_discount=discount_count
         )
\ No newline at end of file
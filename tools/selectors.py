@@ -2,31 +2,144 @@
 Herramientas de descubrimiento y prueba de selectores CSS
 """
 
+import asyncio
+import re
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from dataclasses import asdict, fields
+from typing import Dict, Any, Optional, List, Tuple
 from fastmcp import Context
 from fastmcp.exceptions import ToolError
 
 from browser.browser import MercadoLibreBrowser
-from models.selectors import DiscoveredSelector, SelectorAnalysis, SelectorTestResult
+from browser._page_helpers import SELECTOR_HELPERS_JS
+from models.selectors import SelectorAnalysis, SelectorTestResult
+from models.product import PageInfo
+
+# Offset de paginación en URLs de listado (p.ej. ..._Desde_51)
+_DESDE_RE = re.compile(r'_Desde_\d+')
+
+# Campos planos resueltos una vez: SelectorTestResult usa __slots__ (sin
+# __dict__ por instancia) y serializar por getattr evita la copia recursiva
+# de dataclasses.asdict
+_TEST_RESULT_FIELDS = tuple(f.name for f in fields(SelectorTestResult))
+
+
+def _test_result_dict(result: SelectorTestResult) -> Dict[str, Any]:
+    """Serializa un SelectorTestResult plano (el análisis va como objeto)"""
+    return {name: getattr(result, name) for name in _TEST_RESULT_FIELDS}
+
+
+# Invocaciones mínimas: los cuerpos viven en window.__mlSel, instalado por
+# add_init_script en cada documento del contexto (ver browser/_page_helpers);
+# cada llamada CDP viaja con una expresión diminuta en vez del fuente entero
+_ANALYZE_MANY_CALL_JS = "(opts) => window.__mlSel && window.__mlSel.analyzeMany(opts)"
+_DISCOVER_CALL_JS = "(c) => window.__mlSel && window.__mlSel.discover(c)"
+
+# Reinstalación puntual para documentos creados sin el init script
+_INSTALL_HELPERS_JS = "() => {\n" + SELECTOR_HELPERS_JS + "\n}"
+
+
+
+def _url_template(url: str) -> str:
+    """
+    Normaliza una URL de listado a su plantilla: sin offset de paginación
+    ni query string, de modo que las páginas 2/3/... de la misma búsqueda
+    compartan la misma clave de caché.
+    """
+    return _DESDE_RE.sub('', url.split('?', 1)[0].split('#', 1)[0])
+
+
+# Candidatos de descubrimiento por tipo: (selector, confianza, descripción).
+# La tabla vive en Python para poder extenderla sin tocar el JS genérico.
+_DISCOVERY_SELECTORS = {
+    'products': [
+        ('.ui-search-result', 0.9, 'Tarjeta de producto'),
+        ('.ui-search-result__wrapper', 0.9, 'Tarjeta de producto'),
+        ('[data-testid="result-item"]', 0.9, 'Tarjeta de producto'),
+        ('.shops__item-container', 0.9, 'Tarjeta de producto'),
+        ('.item__info-container', 0.9, 'Tarjeta de producto'),
+    ],
+    'prices': [
+        ('.andes-money-amount__fraction', 0.9, 'Precio de producto'),
+        ('.price-tag-fraction', 0.9, 'Precio de producto'),
+        ('.ui-search-price__part', 0.9, 'Precio de producto'),
+        ('.andes-money-amount__digits', 0.9, 'Precio de producto'),
+    ],
+    'titles': [
+        ('.ui-search-item__title', 0.9, 'Título de producto'),
+        ('.ui-search-item__title-label', 0.9, 'Título de producto'),
+        ('h2.ui-search-item__title', 0.9, 'Título de producto'),
+        ('.ui-search-item__title a', 0.9, 'Título de producto'),
+    ],
+    'navigation': [
+        ('.andes-pagination__button', 0.8, 'Navegación/Paginación'),
+        ('.andes-pagination__button--next', 0.8, 'Navegación/Paginación'),
+        ('.andes-pagination__button--previous', 0.8, 'Navegación/Paginación'),
+        ('a[title="Siguiente"]', 0.8, 'Navegación/Paginación'),
+        ('a[title="Anterior"]', 0.8, 'Navegación/Paginación'),
+    ],
+}
+
 
 
 class SelectorTools:
     """Herramientas para descubrimiento y prueba de selectores"""
     
+    # Máximo de plantillas de URL recordadas antes de desalojar la más vieja
+    _DISCOVERY_CACHE_MAX = 512
+
+    # Máximo de resultados de prueba de selector memoizados
+    _TEST_CACHE_MAX = 256
+
     def __init__(self, browser: MercadoLibreBrowser):
         self.browser = browser
-    
+        # Memoización acotada del descubrimiento: el probe de DOM es caro y
+        # la estructura de la página no cambia entre páginas de una misma
+        # búsqueda, así que un hit evita todo el trabajo de JavaScript
+        self._discovery_cache: Dict[Tuple[str, str], Tuple[Dict[str, Any], ...]] = {}
+        # Memoización LRU de pruebas de selector, clave (url, firma del DOM,
+        # selector, flags): la firma cambia al navegar o mutar el documento,
+        # así que los hits solo ocurren sobre el mismo DOM
+        self._test_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+    def clear_selector_cache(self) -> None:
+        """Vacía las cachés de descubrimiento y de pruebas de selectores"""
+        self._discovery_cache.clear()
+        self._test_cache.clear()
+
+    def _remember_test(self, key: tuple, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Guarda un resultado de prueba desalojando el más viejo si hace falta"""
+        if len(self._test_cache) >= self._TEST_CACHE_MAX:
+            self._test_cache.popitem(last=False)
+        self._test_cache[key] = result
+        return result
+
+    async def _call_helper(self, call_js: str, arg: Any) -> Any:
+        """
+        Invoca un helper de window.__mlSel, reinstalándolo si el documento
+        no lo tiene (p.ej. una página creada antes del init script).
+        """
+        result = await self.browser.page.evaluate(call_js, arg)
+        if result is None:
+            await self.browser.page.evaluate(_INSTALL_HELPERS_JS)
+            result = await self.browser.page.evaluate(call_js, arg)
+        return result
+
     async def discover_selectors(
         self,
         element_type: str = "products",
+        include_page_info: bool = True,
         ctx: Optional[Context] = None
     ) -> Dict[str, Any]:
         """
         Descubre selectores CSS útiles en la página actual.
-        
+
         Args:
             element_type: Tipo de elementos a buscar (products, navigation, search, prices, titles)
+            include_page_info: Si incluir información de la página en el
+                resultado (False ahorra el round-trip de get_page_info
+                cuando el cliente solo quiere selectores)
             ctx: Contexto de FastMCP
         
         Returns:
@@ -39,28 +152,54 @@ class SelectorTools:
             if not self.browser.page:
                 raise ToolError("No hay ninguna página cargada")
             
-            # JavaScript para descubrir selectores específicos
-            js_discovery = self._get_discovery_javascript()
-            discovered_selectors_raw = await self.browser.page.evaluate(js_discovery, element_type)
-            
-            # Convertir a objetos tipados
-            discovered_selectors = [
-                DiscoveredSelector(
-                    selector=s['selector'],
-                    confidence=s['confidence'],
-                    description=s['description'],
-                    element_count=s['element_count']
-                ) for s in discovered_selectors_raw
-            ]
-            
-            page_info = await self.browser.get_page_info()
-            
+            cache_key = (_url_template(self.browser.page.url), element_type)
+            cached = self._discovery_cache.get(cache_key)
+
+            page_info = None
+
+            if cached is not None:
+                # Hit: misma plantilla de búsqueda, cero trabajo de DOM
+                discovered_selectors = cached
+                if include_page_info:
+                    page_info = await self.browser.get_page_info()
+            else:
+                # Helper ya compilado en la página + candidatos del tipo pedido
+                raw = await self._call_helper(
+                    _DISCOVER_CALL_JS, _DISCOVERY_SELECTORS.get(element_type, [])
+                )
+
+                # Tupla inmutable con los dicts tal como llegan del JS:
+                # construir DiscoveredSelector para serializarlos de vuelta a
+                # dict era una vuelta de alocaciones sin aporte
+                discovered_selectors = tuple(raw['discovered'])
+
+                if len(self._discovery_cache) >= self._DISCOVERY_CACHE_MAX:
+                    self._discovery_cache.pop(next(iter(self._discovery_cache)))
+                self._discovery_cache[cache_key] = discovered_selectors
+
+                # El mismo evaluate trae url y título: el PageInfo se arma
+                # aquí sin el segundo round-trip de get_page_info()
+                if include_page_info:
+                    info = raw.get('pageInfo')
+                    if info and info.get('url'):
+                        url = info['url']
+                        page_info = PageInfo(
+                            url=url,
+                            title=info.get('title') or '',
+                            is_ml_mexico=self.browser.is_valid_ml_url(url),
+                            page_type=self.browser._detect_page_type(url),
+                            timestamp=datetime.now().isoformat()
+                        )
+                    else:
+                        page_info = await self.browser.get_page_info()
+
             result = {
                 'element_type': element_type,
-                'page_info': page_info.__dict__,
+                'page_info': asdict(page_info) if page_info else None,
                 'selectors_found': len(discovered_selectors),
-                'selectors': [s.__dict__ for s in discovered_selectors],
+                'selectors': list(discovered_selectors),
                 'timestamp': datetime.now().isoformat(),
+                'from_cache': cached is not None,
                 'recommendations': self._generate_recommendations(discovered_selectors, element_type)
             }
             
@@ -74,6 +213,38 @@ class SelectorTools:
                 await ctx.error(f"Error descubriendo selectores: {str(e)}")
             raise ToolError(f"Error descubriendo selectores: {str(e)}")
     
+    async def discover_selectors_many(
+        self,
+        element_types: List[str],
+        ctx: Optional[Context] = None
+    ) -> Dict[str, Any]:
+        """
+        Descubre selectores para varios tipos de elementos en paralelo.
+
+        Cada evaluate es un mensaje CDP independiente, así que los
+        descubrimientos se solapan con asyncio.gather en lugar de
+        serializar un round-trip por tipo.
+
+        Args:
+            element_types: Tipos a auditar (products, prices, titles, navigation)
+            ctx: Contexto de FastMCP
+
+        Returns:
+            Resultados de descubrimiento indexados por tipo
+        """
+        if ctx:
+            await ctx.info(f"Descubriendo selectores para: {', '.join(element_types)}")
+
+        results = await asyncio.gather(
+            *(self.discover_selectors(element_type) for element_type in element_types)
+        )
+
+        if ctx:
+            total = sum(r['selectors_found'] for r in results)
+            await ctx.info(f"Auditoría completa: {total} selectores en {len(element_types)} tipos")
+
+        return dict(zip(element_types, results))
+
     async def test_selector(
         self,
         selector: str,
@@ -95,105 +266,187 @@ class SelectorTools:
         """
         if ctx:
             await ctx.info(f"Probando selector: {selector}")
-        
+
+        batch = await self.test_selectors(
+            [selector],
+            extract_text=extract_text,
+            check_visibility=check_visibility
+        )
+        result = batch['results'][selector]
+
+        if ctx:
+            await ctx.info(
+                f"Selector probado: {result['element_count']} elementos, "
+                f"utilidad: {result['utility_score']:.2f}"
+            )
+
+        return result
+
+    async def test_selectors(
+        self,
+        selectors: List[str],
+        extract_text: bool = True,
+        check_visibility: bool = True,
+        ctx: Optional[Context] = None
+    ) -> Dict[str, Any]:
+        """
+        Prueba un lote de selectores CSS con un solo viaje al navegador.
+
+        Los selectores que no estén en caché se analizan dentro de un único
+        evaluate: el documento ya tiene layout y estilos calculados tras el
+        primer selector, así que los siguientes los reutilizan en lugar de
+        pagar un round-trip CDP completo cada uno.
+
+        Args:
+            selectors: Selectores CSS a probar
+            extract_text: Si extraer texto de muestra de los elementos encontrados
+            check_visibility: Si verificar la visibilidad de los elementos
+            ctx: Contexto de FastMCP
+
+        Returns:
+            Resultados de prueba indexados por selector bajo 'results'
+        """
+        if ctx:
+            await ctx.info(f"Probando {len(selectors)} selectores")
+
         try:
             if not self.browser.page:
                 raise ToolError("No hay ninguna página cargada")
-            
-            # Encontrar elementos
-            elements = await self.browser.page.query_selector_all(selector)
-            element_count = len(elements)
-            
-            if element_count == 0:
-                return SelectorTestResult(
-                    selector=selector,
-                    success=False,
-                    element_count=0,
-                    message='No se encontraron elementos',
-                    timestamp=datetime.now().isoformat()
-                ).__dict__
-            
-            # Analizar elementos encontrados
-            analysis = await self._analyze_elements(
-                elements[:10],  # Analizar primeros 10
-                extract_text,
-                check_visibility
-            )
-            
-            # Calcular puntuación de utilidad
-            utility_score, recommendations = self._calculate_utility_score(
-                element_count, analysis, selector
+
+            # Firma barata del documento: un evaluate mínimo que permite
+            # reutilizar pruebas completas si el DOM no cambió
+            dom_sig = await self.browser.page.evaluate(
+                "() => [location.href, document.documentElement.outerHTML.length]"
             )
-            
-            result = SelectorTestResult(
+
+            results: Dict[str, Any] = {}
+            pending: List[str] = []
+            for selector in selectors:
+                cache_key = (dom_sig[0], dom_sig[1], selector, extract_text, check_visibility)
+                cached = self._test_cache.get(cache_key)
+                if cached is not None:
+                    self._test_cache.move_to_end(cache_key)
+                    results[selector] = cached
+                else:
+                    pending.append(selector)
+
+            if pending:
+                raws = await self._call_helper(_ANALYZE_MANY_CALL_JS, {
+                    'sels': pending,
+                    'n': 10,
+                    'extractText': extract_text,
+                    'checkVisibility': check_visibility
+                })
+                for selector, raw in zip(pending, raws):
+                    cache_key = (dom_sig[0], dom_sig[1], selector, extract_text, check_visibility)
+                    results[selector] = self._remember_test(
+                        cache_key,
+                        self._build_test_result(selector, raw, extract_text, check_visibility)
+                    )
+
+            if ctx:
+                useful = sum(1 for r in results.values() if r['is_useful'])
+                await ctx.info(f"Lote probado: {useful} de {len(selectors)} selectores útiles")
+
+            return {
+                'success': True,
+                'selectors_tested': len(selectors),
+                'from_cache': len(selectors) - len(pending),
+                'results': results,
+                'timestamp': datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            if ctx:
+                await ctx.error(f"Error probando selectores: {str(e)}")
+            raise ToolError(f"Error probando selectores: {str(e)}")
+
+    def _build_test_result(
+        self,
+        selector: str,
+        raw: Dict[str, Any],
+        extract_text: bool,
+        check_visibility: bool
+    ) -> Dict[str, Any]:
+        """Sintetiza el resultado de prueba desde la respuesta del navegador"""
+        element_count = raw['total']
+
+        if element_count == 0:
+            return _test_result_dict(SelectorTestResult(
+                selector=selector,
+                success=False,
+                element_count=0,
+                message='No se encontraron elementos',
+                timestamp=datetime.now().isoformat()
+            ))
+
+        if element_count > 100:
+            # El JS omitió la muestra: sintetizar el resultado sin el
+            # análisis pesado, con la misma recomendación estructural
+            return _test_result_dict(SelectorTestResult(
                 selector=selector,
                 success=True,
                 element_count=element_count,
-                analysis=analysis,
-                utility_score=min(utility_score, 1.0),
-                recommendations=recommendations,
-                is_useful=utility_score > 0.6,
+                utility_score=0.3,
+                recommendations=['Demasiados elementos - considere un selector más específico'],
+                is_useful=False,
+                message='Análisis de muestra omitido: selector demasiado amplio',
                 timestamp=datetime.now().isoformat()
-            )
-            
-            if ctx:
-                await ctx.info(f"Selector probado: {element_count} elementos, utilidad: {utility_score:.2f}")
-            
-            return result.__dict__
-            
-        except Exception as e:
-            if ctx:
-                await ctx.error(f"Error probando selector: {str(e)}")
-            raise ToolError(f"Error probando selector {selector}: {str(e)}")
-    
-    async def _analyze_elements(
-        self, 
-        elements: List, 
-        extract_text: bool, 
+            ))
+
+        # Analizar elementos encontrados (ya resueltos en el navegador)
+        analysis = self._analyze_elements(raw, extract_text, check_visibility)
+
+        # Calcular puntuación de utilidad
+        utility_score, recommendations = self._calculate_utility_score(
+            element_count, analysis, selector
+        )
+
+        return _test_result_dict(SelectorTestResult(
+            selector=selector,
+            success=True,
+            element_count=element_count,
+            analysis=analysis,
+            utility_score=min(utility_score, 1.0),
+            recommendations=recommendations,
+            is_useful=utility_score > 0.6,
+            timestamp=datetime.now().isoformat()
+        ))
+
+    def _analyze_elements(
+        self,
+        raw: Dict[str, Any],
+        extract_text: bool,
         check_visibility: bool
     ) -> SelectorAnalysis:
-        """Analiza una lista de elementos"""
+        """Construye el análisis desde los elementos ya resueltos en el navegador"""
+        items = raw['items']
         analysis = SelectorAnalysis(
-            element_count=len(elements),
+            element_count=len(items),
             visible_elements=0,
             sample_texts=[],
-            element_types=[],
+            # Conteo por tag agregado dentro del navegador
+            element_types=raw['types'],
             has_useful_content=False
         )
-        
-        for i, element in enumerate(elements):
-            try:
-                # Tipo de elemento
-                tag_name = await element.evaluate('el => el.tagName.toLowerCase()')
-                analysis.element_types.append(tag_name)
-                
-                # Visibilidad
-                if check_visibility:
-                    is_visible = await element.is_visible()
-                    if is_visible:
-                        analysis.visible_elements += 1
-                
-                # Texto de muestra
-                if extract_text:
-                    text = await element.inner_text()
-                    if text and text.strip():
-                        text_sample = text.strip()[:100]
-                        analysis.sample_texts.append({
-                            'index': i,
-                            'text': text_sample,
-                            'length': len(text.strip())
-                        })
-                        
-                        # Verificar si tiene contenido útil
-                        if len(text.strip()) > 10:
-                            analysis.has_useful_content = True
-                
-            except Exception as e:
+
+        for i, item in enumerate(items):
+            # Visibilidad
+            if check_visibility and item['visible']:
+                analysis.visible_elements += 1
+
+            # Texto de muestra
+            if extract_text and item['text']:
                 analysis.sample_texts.append({
                     'index': i,
-                    'error': str(e)
+                    'text': item['text'],
+                    'length': item['length']
                 })
-        
+
+                # Verificar si tiene contenido útil
+                if item['length'] > 10:
+                    analysis.has_useful_content = True
+
         return analysis
     
     def _calculate_utility_score(
@@ -225,117 +478,35 @@ class SelectorTools:
         elif element_count < 3 and 'product' in selector.lower():
             recommendations.append("Pocos productos encontrados - verifique que esté en página de resultados")
         
-        # Tipos de elementos únicos
-        unique_types = list(set(analysis.element_types))
+        # Tipos de elementos únicos (element_types ya llega como conteo por tag)
+        unique_types = list(analysis.element_types)
         if len(unique_types) > 1:
             recommendations.append(f"Selector encuentra múltiples tipos: {', '.join(unique_types)}")
         
         return utility_score, recommendations
     
     def _generate_recommendations(
-        self, 
-        selectors: List[DiscoveredSelector], 
+        self,
+        selectors: Tuple[Dict[str, Any], ...],
         element_type: str
     ) -> List[str]:
         """Genera recomendaciones basadas en selectores descubiertos"""
         recommendations = []
         
         if selectors:
-            best_selector = selectors[0]
+            # El JS ya no ordena la lista completa: un max O(n) alcanza para
+            # el mejor selector y un conteo directo para los de alta confianza
+            best_selector = max(
+                selectors, key=lambda s: (s['confidence'], s['element_count'])
+            )
             recommendations.append(
-                f"Mejor selector: {best_selector.selector} (confianza: {best_selector.confidence:.1f})"
+                f"Mejor selector: {best_selector['selector']} (confianza: {best_selector['confidence']:.1f})"
             )
-            
-            high_confidence = [s for s in selectors if s.confidence >= 0.8]
-            if len(high_confidence) > 1:
-                recommendations.append(f"{len(high_confidence)} selectores de alta confianza disponibles")
+
+            high_confidence = sum(1 for s in selectors if s['confidence'] >= 0.8)
+            if high_confidence > 1:
+                recommendations.append(f"{high_confidence} selectores de alta confianza disponibles")
         else:
             recommendations.append(f"No se encontraron selectores para {element_type}")
         
         return recommendations
-    
-    def _get_discovery_javascript(self) -> str:
-        """Retorna el código JavaScript para descubrir selectores"""
-        return """
-        (elementType) => {
-            const discovered = [];
-            
-            function addSelector(selector, confidence, description, elementCount) {
-                if (elementCount > 0) {
-                    discovered.push({
-                        selector: selector,
-                        confidence: confidence,
-                        description: description,
-                        element_count: elementCount
-                    });
-                }
-            }
-            
-            if (elementType === 'products') {
-                const productSelectors = [
-                    '.ui-search-result',
-                    '.ui-search-result__wrapper',
-                    '[data-testid="result-item"]',
-                    '.shops__item-container',
-                    '.item__info-container'
-                ];
-                
-                productSelectors.forEach(sel => {
-                    const elements = document.querySelectorAll(sel);
-                    if (elements.length > 0) {
-                        addSelector(sel, 0.9, 'Tarjeta de producto', elements.length);
-                    }
-                });
-            }
-            
-            else if (elementType === 'prices') {
-                const priceSelectors = [
-                    '.andes-money-amount__fraction',
-                    '.price-tag-fraction',
-                    '.ui-search-price__part',
-                    '.andes-money-amount__digits'
-                ];
-                
-                priceSelectors.forEach(sel => {
-                    const elements = document.querySelectorAll(sel);
-                    addSelector(sel, 0.9, 'Precio de producto', elements.length);
-                });
-            }
-            
-            else if (elementType === 'titles') {
-                const titleSelectors = [
-                    '.ui-search-item__title',
-                    '.ui-search-item__title-label',
-                    'h2.ui-search-item__title',
-                    '.ui-search-item__title a'
-                ];
-                
-                titleSelectors.forEach(sel => {
-                    const elements = document.querySelectorAll(sel);
-                    addSelector(sel, 0.9, 'Título de producto', elements.length);
-                });
-            }
-            
-            else if (elementType === 'navigation') {
-                const navSelectors = [
-                    '.andes-pagination__button',
-                    '.andes-pagination__button--next',
-                    '.andes-pagination__button--previous',
-                    'a[title="Siguiente"]',
-                    'a[title="Anterior"]'
-                ];
-                
-                navSelectors.forEach(sel => {
-                    const elements = document.querySelectorAll(sel);
-                    addSelector(sel, 0.8, 'Navegación/Paginación', elements.length);
-                });
-            }
-            
-            return discovered.sort((a, b) => {
-                if (a.confidence !== b.confidence) {
-                    return b.confidence - a.confidence;
-                }
-                return b.element_count - a.element_count;
-            });
-        }
-        """
\ No newline at end of file
@@ -1,3 +1,6 @@
+import asyncio
+import secrets
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
@@ -6,6 +9,28 @@ from fastmcp.exceptions import ToolError
 
 from browser.browser import MercadoLibreBrowser
 
+# Espera dirigida por eventos para state="attached": un MutationObserver
+# resuelve en el instante de la mutación que agrega el nodo, en lugar del
+# poll por frame del camino genérico de Playwright
+_WAIT_ATTACHED_JS = """
+(opts) => new Promise((resolve, reject) => {
+    const { sel, timeout } = opts;
+    if (document.querySelector(sel)) return resolve(true);
+    const mo = new MutationObserver(() => {
+        if (document.querySelector(sel)) {
+            mo.disconnect();
+            clearTimeout(timer);
+            resolve(true);
+        }
+    });
+    const timer = setTimeout(() => {
+        mo.disconnect();
+        reject(new Error('timeout esperando ' + sel));
+    }, timeout);
+    mo.observe(document, { childList: true, subtree: true, attributes: true });
+})
+"""
+
 
 class UtilityTools:
     """Herramientas de utilidades generales"""
@@ -17,45 +42,61 @@ class UtilityTools:
         self,
         filename: Optional[str] = None,
         full_page: bool = False,
+        image_format: str = "png",
         ctx: Optional[Context] = None
     ) -> Dict[str, Any]:
         """
         Toma una captura de pantalla de la página actual.
-        
+
         Args:
-            filename: Nombre del archivo (opcional, se genera automáticamente si no se especifica)
+            filename: Nombre del archivo (opcional; se genera uno único con
+                epoch + sufijo aleatorio si no se especifica)
             full_page: Si capturar toda la página o solo la parte visible
+            image_format: Formato de imagen ("png" o "jpeg"; jpeg codifica
+                varias veces más rápido y sirve para miniaturas del viewport)
             ctx: Contexto de FastMCP
-        
+
         Returns:
             Información sobre la captura tomada
         """
         if ctx:
             await ctx.info("Tomando captura de pantalla")
-        
+
         try:
             if not self.browser.page:
                 raise ToolError("No hay ninguna página cargada")
-            
+
+            if image_format not in ('png', 'jpeg'):
+                raise ToolError(f"Formato de imagen no soportado: {image_format}")
+
+            extension = '.png' if image_format == 'png' else '.jpg'
+
             if not filename:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"ml_screenshot_{timestamp}.png"
-            
-            # Asegurar que termine en .png
-            if not filename.endswith('.png'):
-                filename += '.png'
-            
+                # Epoch + sufijo aleatorio: strftime con resolución de
+                # segundo colisionaba (y pisaba archivos) al capturar en
+                # loops apretados
+                filename = f"ml_screenshot_{int(time.time())}_{secrets.token_hex(3)}{extension}"
+
+            # Asegurar la extensión acorde al formato
+            if not filename.endswith(extension):
+                filename += extension
+
             screenshot_path = Path(filename)
-            
-            await self.browser.page.screenshot(
-                path=screenshot_path,
-                full_page=full_page
+
+            # La captura llega como bytes y la escritura va a un hilo: el
+            # acceso a disco no bloquea el loop de eventos
+            buf = await self.browser.page.screenshot(
+                full_page=full_page,
+                type=image_format,
+                quality=80 if image_format == 'jpeg' else None
             )
-            
+            await asyncio.to_thread(screenshot_path.write_bytes, buf)
+
             result = {
                 'success': True,
                 'filename': str(screenshot_path),
                 'full_page': full_page,
+                'image_format': image_format,
                 'page_url': self.browser.page.url,
                 'page_title': await self.browser.page.title(),
                 'timestamp': datetime.now().isoformat()
@@ -98,13 +139,21 @@ class UtilityTools:
                 raise ToolError("No hay ninguna página cargada")
             
             start_time = datetime.now()
-            
-            await self.browser.page.wait_for_selector(
-                selector,
-                timeout=timeout,
-                state=state
-            )
-            
+
+            if state == "attached":
+                # Existencia pura: el observer reacciona a la mutación. Los
+                # estados visible/hidden/detached dependen de layout y siguen
+                # en wait_for_selector
+                await self.browser.page.evaluate(
+                    _WAIT_ATTACHED_JS, {'sel': selector, 'timeout': timeout}
+                )
+            else:
+                await self.browser.page.wait_for_selector(
+                    selector,
+                    timeout=timeout,
+                    state=state
+                )
+
             end_time = datetime.now()
             wait_duration = (end_time - start_time).total_seconds()
             